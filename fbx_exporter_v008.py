@@ -5,26 +5,47 @@ Release: v008
 """
 
 import functools
+import gzip
+import hashlib
+import json
 import os
-import re
+import shutil
+import socket
+import struct
+import subprocess
 import tempfile
+import time
+import traceback
+import zipfile
 
-from maya import cmds, mel
-from PySide2 import QtWidgets, QtGui, QtCore
-from PySide2.QtCore import Qt
+from maya import cmds
+
+from fbx_exporter_v008_bake import _merge_bake_segments, _split_range
 
 DIALOG = None
-_MIN_W = 60
-_MIN_H = 20
+_TIMINGS_JSON = '{}/.fbx_exporter/timings.json'.format(
+    tempfile.gettempdir()).replace('\\', '/')
+_MAX_TIMINGS = 1000
+_EVENTS_LOG = '{}/.fbx_exporter/events.log'.format(
+    tempfile.gettempdir()).replace('\\', '/')
+_EVENT_CALLBACKS = []
+_FBX_MAGIC = b'Kaydara FBX Binary  \x00'
+_FBX_VOLATILE_NODES = set([b'FBXHeaderExtension', b'FileId', b'CreationTime'])
 
 
 def _ok_cancel(msg, title="Confirm"):
     """Raise a simple message box dialog.
 
+    In batch mode the message is printed and accepted.
+
     Args:
         msg (str): message to show in dialog
         title (str): dialog window title
     """
+    if cmds.about(batch=True):
+        print '{}: {}'.format(title.upper(), msg)
+        return 'Ok'
+    from fbx_exporter_v008_ui import _MessageBox
     _box = _MessageBox(title=title, text=msg, buttons=('Ok', 'Cancel'))
     return _box.get_result()
 
@@ -32,134 +53,291 @@ def _ok_cancel(msg, title="Confirm"):
 def _notify(msg, title="Confirm"):
     """Raise a simple message box dialog.
 
+    In batch mode the message is printed.
+
     Args:
         msg (str): message to show in dialog
         title (str): dialog window title
     """
+    if cmds.about(batch=True):
+        print '{}: {}'.format(title.upper(), msg)
+        return 'Ok'
+    from fbx_exporter_v008_ui import _MessageBox
     _box = _MessageBox(title=title, text=msg, buttons=('Ok', ))
     return _box.get_result()
 
 
-class _MessageBox(QtWidgets.QMessageBox):
-    """Simple message box interface."""
+def _progress(items, title='Progress', parent=None):
+    """Iterate the given items, showing a progress bar.
+
+    In batch mode no progress bar is shown.
+
+    Args:
+        items (list): items to iterate
+        title (str): progress bar title
+        parent (QDialog): parent interface
+
+    Returns:
+        (iterator): items iterator
+    """
+    if cmds.about(batch=True):
+        return iter(items)
+    from fbx_exporter_v008_ui import _ProgressBar
+    return _ProgressBar(items, title=title, parent=parent)
+
+
+class _Path(object):
+    """Represents a path on disk."""
 
-    def __init__(self, text, title, buttons):
+    def __init__(self, path):
         """Constructor.
 
         Args:
-            text (str): message to display
-            title (str): title for the interface
-            buttons (str list): buttons to show
+            path (str): path in file structure
         """
-        super(_MessageBox, self).__init__()
-        self.setWindowTitle(title)
-        self.setText(text)
-        self.buttons = self._add_buttons(buttons)
+        self.path = path
+        self.dir = os.path.dirname(path)
+        self.filename = os.path.basename(path)
+        if '.' in self.filename:
+            _tokens = self.filename.split('.')
+            self.extn = _tokens[-1]
+            self.basename = '.'.join(_tokens[:-1])
+        else:
+            self.extn = None
+            self.basename = self.filename
 
-    def _add_buttons(self, buttons):
-        """Add the buttons to the interface.
+
+class _FbxPackager(object):
+    """Compresses exported fbxs into a per-shot archive.
+
+    Each fbx is gzipped on a thread pool as soon as it is submitted, into
+    a cache dir alongside the archive. A hash of each fbx (ignoring its
+    creation timestamp) is stored in a content index in the cache so
+    unchanged fbxs are not recompressed on the next export. On finish, the
+    fbxs submitted in this batch are written to a zip archive along with
+    their index, without further compression, ready to sync.
+    """
+
+    def __init__(self, archive, threads=4):
+        """Constructor.
 
         Args:
-            buttons (str list): buttons to show
+            archive (str): path to zip archive to write
+            threads (int): number of compression threads
         """
-        _buttons = list(buttons)
-
-        # Create buttons
-        _btn_map = {}
-        for _button in _buttons:
-            _btn_map[_button] = self.addButton(
-                _button, QtWidgets.QMessageBox.AcceptRole)
-
-        # Make sure we have cancel behaviour
-        if "Cancel" not in _btn_map:
-            _btn_map["Cancel"] = self.addButton(
-                "Cancel", QtWidgets.QMessageBox.AcceptRole)
-            _btn_map["Cancel"].hide()
-            _buttons += ["Cancel"]
-        print _btn_map
-        self.setEscapeButton(_btn_map["Cancel"])
-        self.setDefaultButton(_btn_map["Cancel"])
-
-        return _buttons
-
-    def get_result(self):
-        """Read the result of the dialog."""
-        _exec_result = self.exec_()
-        _result = self.buttons[_exec_result]
-        if _result == "Cancel":
-            raise RuntimeError
-        return _result
+        self.archive = archive
+        self.cache = '{}/.{}_cache'.format(
+            os.path.dirname(archive), _Path(archive).basename)
+        if not os.path.exists(self.cache):
+            os.makedirs(self.cache)
+        self.index = self._read_index()
+        from multiprocessing.pool import ThreadPool
+        self.results = []
+        self.pool = ThreadPool(threads)
+
+    def _read_index(self):
+        """Read content index from cache dir.
 
+        Returns:
+            (dict): filename/data index of cached files
+        """
+        _index_json = '{}/index.json'.format(self.cache)
+        if not os.path.exists(_index_json):
+            return {}
+        with open(_index_json) as _file:
+            return json.load(_file)
 
-class _ProgressBar(object):
-    """Iterator which shows a progress bar dialog."""
+    @property
+    def pending(self):
+        """Get number of fbxs waiting to be compressed."""
+        return len([_result for _result in self.results
+                    if not _result.ready()])
 
-    def __init__(self, items, title='Progress', parent=None):
-        """Constructor.
+    def submit(self, fbx):
+        """Queue compression of the given fbx.
 
         Args:
-            items (list): items to iterate
-            title (str): progress bar title
-            parent (QDialog): parent interface
+            fbx (str): path to exported fbx
         """
-        self.items = items[:]
-        self.n_items = len(self.items)
+        self.results.append(self.pool.apply_async(self._compress, (fbx, )))
 
-        _args = [parent] if parent else []
-        self.progress = QtWidgets.QProgressBar(*_args)
+    def close(self):
+        """Wait for any queued compression to complete and stop threads."""
+        self.pool.close()
+        self.pool.join()
 
-        self.progress.show()
-        self.progress.setValue(0)
-        self.progress.resize(300, 50)
-        self.progress.setWindowTitle(title)
-        if parent:
-            _pos = (parent.geometry().center() -
-                    parent.geometry().topLeft() -
-                    self.progress.geometry().center())
-            # print parent.geometry().center()
-            # print self.progress.geometry().center()
-            self.progress.move(_pos)
+    def _compress(self, fbx):
+        """Compress the given fbx into the cache (executed in thread).
 
-        self.app = QtWidgets.QApplication.instance()
+        Args:
+            fbx (str): path to fbx to compress
 
-    def next(self):
-        """Get the next iteration.
+        Returns:
+            (tuple): filename and index data
+        """
+        _filename = os.path.basename(fbx)
+        _gz = '{}/{}.gz'.format(self.cache, _filename)
+
+        # Check for changes
+        _data = {'md5': _hash_fbx(fbx), 'size': os.path.getsize(fbx)}
+        _cached = self.index.get(_filename)
+        if (
+                _cached and _cached['md5'] == _data['md5'] and
+                os.path.exists(_gz)):
+            _lprint(' - PACKAGE UNCHANGED', _filename)
+            return _filename, _cached
+
+        # Compress
+        with open(fbx, 'rb') as _src, gzip.open(_gz, 'wb') as _dest:
+            shutil.copyfileobj(_src, _dest, 1 << 20)
+        _data['compressed_size'] = os.path.getsize(_gz)
+        _lprint(' - PACKAGED', _filename)
+        return _filename, _data
+
+    def finish(self):
+        """Wait for compression to complete and write archive.
 
         Returns:
-            (any): next item
+            (str): path to archive
         """
-        self.app.processEvents()
-        if not self.items:
-            self.progress.close()
-            raise StopIteration
-        _next = self.items.pop(0)
-        _fr = 1.0 - 1.0*len(self.items)/self.n_items
-        self.progress.setValue(_fr*100)
-        return _next
+        self.close()
+        _batch = dict([_result.get() for _result in self.results])
+        self.index.update(_batch)
+
+        # Write cache index
+        _index_json = '{}/index.json'.format(self.cache)
+        with open(_index_json, 'w') as _file:
+            json.dump(self.index, _file, indent=4, sort_keys=True)
+
+        # Write archive of this batch
+        print 'WRITING ARCHIVE', self.archive
+        with zipfile.ZipFile(self.archive, 'w', zipfile.ZIP_STORED) as _zip:
+            for _filename in sorted(_batch):
+                _gz = '{}/{}.gz'.format(self.cache, _filename)
+                _zip.write(_gz, _filename+'.gz')
+            _zip.writestr('index.json', json.dumps(
+                _batch, indent=4, sort_keys=True))
+
+        return self.archive
+
+
+class _ExportEventLog(object):
+    """Emits structured export events.
+
+    Each event is a dict which is appended to a rotating log file as
+    newline delimited json and passed to any callbacks registered with
+    add_event_callback. Events carry the host, pid and scene so that logs
+    from several farm nodes can be merged. Errors writing the log or in
+    callbacks are reported but never interrupt an export.
+    """
 
-    def __iter__(self):
-        return self
+    def __init__(self, path=_EVENTS_LOG, scene=None, max_bytes=10000000,
+                 backups=5):
+        """Constructor.
 
+        Args:
+            path (str): path to log file (None to disable log)
+            scene (str): name of scene being exported
+            max_bytes (int): size at which log file is rotated
+            backups (int): number of rotated log files to keep
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.context = {
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'scene': scene}
+        if self.path and not os.path.exists(os.path.dirname(self.path)):
+            try:
+                os.makedirs(os.path.dirname(self.path))
+            except OSError as _exc:  # eg. created by another process
+                if not os.path.isdir(os.path.dirname(self.path)):
+                    print ' - FAILED TO CREATE EVENT LOG DIR', self.path, _exc
+
+    def emit(self, event, exportable, **data):
+        """Emit an event.
 
-class _Path(object):
-    """Represents a path on disk."""
+        Args:
+            event (str): event type (start/stage/finish/error)
+            exportable (str): name of exportable (None for events which
+                cover a whole export group)
 
-    def __init__(self, path):
-        """Constructor.
+        Returns:
+            (dict): event data
+        """
+        _event = dict(self.context)
+        _event.update(data)
+        _event.update({
+            'event': event,
+            'exportable': exportable,
+            'time': time.time()})
+        if self.path:
+            try:
+                self._write(json.dumps(_event, sort_keys=True))
+            except (IOError, OSError) as _exc:
+                print ' - FAILED TO WRITE EVENT', self.path, _exc
+        for _callback in list(_EVENT_CALLBACKS):
+            try:
+                _callback(_event)
+            except Exception:
+                print ' - EVENT CALLBACK FAILED', _callback
+                traceback.print_exc()
+        return _event
+
+    def finish(self, exportable, secs, fbxs, frames=0, est_keys=0, **data):
+        """Emit finish event with throughput metrics.
+
+        The metrics only cover this exportable's own work, so they can be
+        summed across exportables. A group's shared bake is reported once
+        in its bake stage event.
 
         Args:
-            path (str): path in file structure
+            exportable (str): name of exportable
+            secs (float): time spent exporting this exportable
+            fbxs (str list): fbxs which were written
+            frames (int): frames exported
+            est_keys (int): estimated keys written
+
+        Returns:
+            (dict): event data
         """
-        self.path = path
-        self.dir = os.path.dirname(path)
-        self.filename = os.path.basename(path)
-        if '.' in self.filename:
-            _tokens = self.filename.split('.')
-            self.extn = _tokens[-1]
-            self.basename = '.'.join(_tokens[:-1])
-        else:
-            self.extn = None
-            self.basename = self.filename
+        _secs = max(secs, 0.001)
+        return self.emit(
+            'finish', exportable, secs=_secs, frames=frames,
+            est_keys=est_keys, frames_per_sec=frames/_secs,
+            est_keys_per_sec=est_keys/_secs,
+            bytes=sum([os.path.getsize(_fbx) for _fbx in fbxs
+                       if os.path.exists(_fbx)]), **data)
+
+    def _rotate(self):
+        """Rotate log files."""
+        _paths = [self.path] + [
+            '{}.{:d}'.format(self.path, _idx)
+            for _idx in range(1, self.backups+1)]
+        for _idx in range(self.backups, 0, -1):
+            _src, _dest = _paths[_idx-1], _paths[_idx]
+            if not os.path.exists(_src):
+                continue
+            if os.path.exists(_dest):
+                os.remove(_dest)
+            os.rename(_src, _dest)
+
+    def _write(self, line):
+        """Append a line to the log file.
+
+        Args:
+            line (str): line to write
+        """
+        if (
+                os.path.exists(self.path) and
+                os.path.getsize(self.path) > self.max_bytes):
+            try:
+                self._rotate()
+            except OSError as _exc:  # eg. log held open on windows
+                print ' - FAILED TO ROTATE EVENT LOG', self.path, _exc
+        with open(self.path, 'a') as _file:
+            _file.write(line+'\n')
 
 
 def _restore_sel(func):
@@ -193,10 +371,221 @@ def _abs_path(path):
     return os.path.abspath(path).replace('\\', '/')
 
 
+def _apply_bake(channels, plugs, start):
+    """Write baked channel values to anim curves.
+
+    Any existing input connections to the plugs are replaced. The curve
+    nodes are created and connected with cmds so that this can be undone,
+    and are then filled with keys through the api for speed.
+
+    Args:
+        channels (dict): channel key/values (in ui units) for each frame
+        plugs (dict): channel key/plug to apply values to
+        start (int): frame of first value
+    """
+    from maya.api import OpenMaya, OpenMayaAnim
+
+    _unit = OpenMaya.MTime.uiUnit()
+    for _key, _values in sorted(channels.items()):
+        _plug = plugs[_key]
+
+        # Convert to internal units
+        _type = cmds.getAttr(_plug, type=True)
+        _curve_type = 'animCurveTU'
+        if _type == 'doubleAngle':
+            _curve_type = 'animCurveTA'
+            _values = [OpenMaya.MAngle.uiToInternal(_val)
+                       for _val in _values]
+        elif _type == 'doubleLinear':
+            _curve_type = 'animCurveTL'
+            _values = [OpenMaya.MDistance.uiToInternal(_val)
+                       for _val in _values]
+
+        _curve = cmds.createNode(_curve_type)
+        cmds.connectAttr(_curve+'.output', _plug, force=True)
+        _times = OpenMaya.MTimeArray()
+        for _idx in range(len(_values)):
+            _times.append(OpenMaya.MTime(start+_idx, _unit))
+        _list = OpenMaya.MSelectionList()
+        _list.add(_curve)
+        OpenMayaAnim.MFnAnimCurve(_list.getDependNode(0)).addKeys(
+            _times, _values)
+
+
+def _bake_in_workers(cams, range_, workers, rigs=()):
+    """Sample world space camera and rig anim across mayapy processes.
+
+    Each worker opens the current scene from disk, so unsaved changes are
+    not included.
+
+    Args:
+        cams (Camera list): cameras to sample
+        range_ (tuple): start/end frames
+        workers (int): number of worker processes
+        rigs (tuple list): rig namespace/nodes pairs to sample
+
+    Returns:
+        (dict list): sampled segments
+    """
+    _scene = cmds.file(query=True, sceneName=True)
+    if not _scene:
+        raise RuntimeError('Scene must be saved to bake in workers')
+    if cmds.file(query=True, modified=True):
+        _ok_cancel('Scene has unsaved changes which will be ignored by '
+                   'the bake workers.\n\nContinue?')
+
+    _mayapy = '{}/bin/mayapy{}'.format(
+        os.environ['MAYA_LOCATION'], '.exe' if os.name == 'nt' else '')
+    _tmp_dir = tempfile.mkdtemp(prefix='fbx_bake_')
+    _procs = []
+    try:
+        for _idx, _range in enumerate(_split_range(range_, workers)):
+            _job = _abs_path('{}/job_{:d}.json'.format(_tmp_dir, _idx))
+            _output = _abs_path('{}/result_{:d}.json'.format(
+                _tmp_dir, _idx))
+            with open(_job, 'w') as _file:
+                json.dump({
+                    'scene': _scene,
+                    'cams': [_cam.tfm for _cam in cams],
+                    'rigs': list(rigs),
+                    'range': _range,
+                    'output': _output}, _file)
+            _code = '; '.join([
+                'import sys',
+                'sys.path.insert(0, {!r})'.format(
+                    os.path.dirname(os.path.abspath(__file__))),
+                'import fbx_exporter_v008',
+                'fbx_exporter_v008._bake_worker({!r})'.format(_job)])
+            print ' - LAUNCHING BAKE WORKER', _range
+            _procs.append(
+                (_output, subprocess.Popen([_mayapy, '-c', _code])))
+
+        # Read results
+        _segments = []
+        for _output, _proc in _procs:
+            if _proc.wait():
+                raise RuntimeError('Bake worker failed '+_output)
+            with open(_output) as _file:
+                _segments.append(json.load(_file))
+
+    finally:
+        for _, _proc in _procs:
+            if _proc.poll() is None:
+                print ' - TERMINATING BAKE WORKER', _proc.pid
+                _proc.terminate()
+                _proc.wait()
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+    return _segments
+
+
+def _bake_worker(job):
+    """Sample world space camera and rig anim for a bake job (in mayapy).
+
+    Args:
+        job (str): path to job json
+    """
+    import maya.standalone
+    maya.standalone.initialize()
+
+    with open(job) as _file:
+        _job = json.load(_file)
+    cmds.file(_job['scene'], open=True, force=True)
+    _dups = [_Camera(_tfm).build_world_space_dup()[0]
+             for _tfm in _job['cams']]
+    _plugs = _find_bake_channels(_dups, rigs=_job['rigs'])
+
+    # Sample values
+    _start, _end = _job['range']
+    _channels = dict([(_key, []) for _key in _plugs])
+    for _frame in range(_start, _end+1):
+        cmds.currentTime(_frame, update=True)
+        for _key, _plug in _plugs.items():
+            _channels[_key].append(cmds.getAttr(_plug))
+
+    with open(_job['output'], 'w') as _file:
+        json.dump({'range': _job['range'], 'channels': _channels}, _file)
+
+
+def _build_timing(fbxs, start, keys):
+    """Build a timing report entry for an export.
+
+    Args:
+        fbxs (str list): fbxs which were written
+        start (float): export start time
+        keys (int): estimated keys written
+
+    Returns:
+        (dict): timing data
+    """
+    return {
+        'keys': keys,
+        'secs': time.time() - start,
+        'bytes': sum([os.path.getsize(_fbx) for _fbx in fbxs
+                      if os.path.exists(_fbx)])}
+
+
+def _estimate_exports(exportables, range_, roots=None, timings=_TIMINGS_JSON):
+    """Estimate the cost of exporting the given exportables.
+
+    Key counts assume that every animated channel is baked on every frame.
+    Time and size are estimated from a linear fit of keys against seconds
+    and bytes from past timing reports, if there are any.
+
+    Args:
+        exportables (Exportable list): exportables to estimate
+        range_ (tuple): export range start/end
+        roots (str list): list of root nodes for rig exports
+        timings (str): path to timing report to calibrate from
+
+    Returns:
+        (dict list): estimate for each exportable
+    """
+    _records = _read_timings(timings) if timings else []
+    _secs_fit = _fit_timings(_records, 'secs')
+    _bytes_fit = _fit_timings(_records, 'bytes')
+
+    _start, _end = range_
+    _frames = int(_end - _start + 1)
+    _estimates = []
+    for _exp in exportables:
+        _nodes = _exp.find_nodes()
+        if isinstance(_exp, _Rig) and roots:
+            _nodes = _exp.find_root_nodes(roots)
+            if _nodes:
+                _nodes += cmds.listRelatives(
+                    _nodes, allDescendents=True, fullPath=True) or []
+        _chans = _find_anim_channels(_nodes)
+        _estimate = {
+            'exportable': _exp.name,
+            'nodes': len(_nodes),
+            'channels': len(_chans),
+            'frames': _frames,
+            'keys': len(_chans)*_frames,
+            'secs': None,
+            'bytes': None}
+        for _key, _fit in [('secs', _secs_fit), ('bytes', _bytes_fit)]:
+            if _fit:
+                _intercept, _slope = _fit
+                _estimate[_key] = max(
+                    0.0, _intercept + _slope*_estimate['keys'])
+        print ' - ESTIMATE', _estimate
+        _estimates.append(_estimate)
+
+    return _estimates
+
+
 def _export_fbxs(exportables, dir_, range_, parent=None, add_border_keys=True,
-                 bake_cams_in_world=True, roots=None):
+                 bake_cams_in_world=True, roots=None, package=False,
+                 dry_run=False, timings=_TIMINGS_JSON,
+                 share_skeletons=False, events=_EVENTS_LOG, bake_workers=1):
     """Export fbxs for the given exportables.
 
+    Key counts for the timing report and events are estimated before
+    export, which lists the attributes and connections of every exported
+    node. On large rigs this can be skipped by disabling timings and
+    events (with no event callbacks registered).
+
     Args:
         exportables (Exportable list): exportables to build fbxs for
         dir_ (str): export directory
@@ -205,6 +594,20 @@ def _export_fbxs(exportables, dir_, range_, parent=None, add_border_keys=True,
         add_border_keys (bool): add start/end frame keys
         bake_cams_in_world (bool): bake cameras in world space
         roots (str list): list of root nodes for rig exports
+        package (bool): compress exported fbxs into a per-shot archive
+        dry_run (bool): don't export - just return cost estimates
+        timings (str): path to timing report used to calibrate estimates
+            and to record export timings to
+        share_skeletons (bool): export skeleton once for each rig file
+            and only animation for each reference of that file
+        events (str): path to event log (None to only send events to
+            callbacks)
+        bake_workers (int): number of mayapy processes to split world
+            space camera and rig bakes across
+
+    Returns:
+        (str|dict list): path to archive (if packaging) or list of
+            estimates (if dry run)
     """
     _cur_scene = cmds.file(query=True, location=True)
     print 'EXPORT {:d}-{:d}'.format(*range_)
@@ -221,10 +624,42 @@ def _export_fbxs(exportables, dir_, range_, parent=None, add_border_keys=True,
         _exports.append((_exp, _fbx))
         if os.path.exists(_fbx):
             _to_delete.append(_fbx)
+
+    # Find shared skeleton paths - the source file path hash keeps rigs
+    # with the same filename apart
+    _skeletons = []
+    _skeleton_fbxs = {}
+    if share_skeletons:
+        for _exp in exportables:
+            if (
+                    not isinstance(_exp, _Rig) or
+                    _exp.source_file in _skeleton_fbxs):
+                continue
+            _fbx = _abs_path('{}/SK_{}_{}.fbx'.format(
+                dir_, _Path(_exp.source_file).basename,
+                hashlib.md5(_exp.source_file).hexdigest()[:8]))
+            _skeleton_fbxs[_exp.source_file] = _fbx
+            print ' - CHECKING', _fbx
+            _skeletons.append((_exp, _fbx))
+            if os.path.exists(_fbx):
+                _to_delete.append(_fbx)
+
     if not _exports:
         _notify('Nothing selected to export')
         return
 
+    # Estimate cost - only if the key counts are needed
+    _keys = dict([(_exp, 0) for _exp in exportables])
+    if dry_run or timings or events or _EVENT_CALLBACKS:
+        _estimates = _estimate_exports(
+            exportables=exportables, range_=range_, roots=roots,
+            timings=timings)
+        if dry_run:
+            return _estimates
+        _keys = dict([(_exp, _estimate['keys'])
+                      for _exp, _estimate in zip(exportables, _estimates)])
+    _timings = []
+
     # Make sure export path exists
     if not os.path.exists(dir_):
         _ok_cancel('Create dir?\n\n'+dir_)
@@ -238,39 +673,264 @@ def _export_fbxs(exportables, dir_, range_, parent=None, add_border_keys=True,
             os.remove(_fbx)
 
     # Execute export
-    _title = 'Exporting {:d} fbxs'.format(len(_exports))
-    _kwargs = dict(range_=range_, add_border_keys=add_border_keys)
-    for _exp, _fbx in _ProgressBar(_exports, title=_title, parent=parent):
-        print ' - EXPORTING', _exp, _fbx
-        _kwargs['fbx'] = _fbx
-        if isinstance(_exp, _Camera) and bake_cams_in_world:
-            _exp.export_fbx_in_world_space(**_kwargs)
-        elif isinstance(_exp, _Rig) and roots:
-            _possible_nodes = [
-                '{}:{}'.format(_exp.namespace, _root)
-                for _root in roots]
-            _nodes = [_node for _node in _possible_nodes
-                      if cmds.objExists(_node)]
-            if not _nodes:
-                _notify('No root nodes exist in {}:\n\n   '
-                        '{}\n\nNothing was exported.'.format(
-                            _exp.namespace,
-                            '\n   '.join(_possible_nodes)),
-                        title='Warning')
+    _packager = None
+    if package:
+        _packager = _FbxPackager(_abs_path('{}/A_{}.zip'.format(
+            dir_, _Path(_cur_scene).basename)))
+    _groups = _find_export_groups([_exp for _exp, _ in _exports])
+
+    # Independent cams are cheap to bake so bake them all together
+    _cam_groups = [_group for _group in _groups
+                   if all([isinstance(_exp, _Camera) for _exp in _group])]
+    if len(_cam_groups) > 1:
+        _groups = [_group for _group in _groups
+                   if _group not in _cam_groups]
+        _groups.insert(0, sum(_cam_groups, []))
+    print ' - FOUND {:d} EXPORT GROUPS'.format(len(_groups))
+    _title = 'Exporting {:d} fbxs in {:d} groups'.format(
+        len(_exports), len(_groups))
+    _fbxs = dict(_exports)
+    _frames = int(range_[1] - range_[0] + 1)
+    _events = _ExportEventLog(path=events, scene=_Path(_cur_scene).basename)
+    _queue = len(_exports) + len(_skeletons)
+
+    try:
+        # Export shared skeletons once for each rig file
+        for _exp, _fbx in _skeletons:
+            print ' - EXPORTING SKELETON', _exp, _fbx
+            _queue -= 1
+            _start = time.time()
+            _events.emit('start', _exp.name, fbx=_fbx, skeleton=True,
+                         queue_depth=_queue)
+            _nodes = _exp.find_root_nodes(roots) if roots else None
+            if roots and not _nodes:
+                _events.emit('finish', _exp.name, skeleton=True, skipped=True,
+                             queue_depth=_queue)
                 continue
-            _exp.export_fbx(nodes=_nodes, **_kwargs)
-        else:
-            _exp.export_fbx(**_kwargs)
+            try:
+                _exp.export_skeleton_fbx(
+                    fbx=_fbx, range_=range_, nodes=_nodes)
+            except Exception as _exc:
+                _events.emit('error', _exp.name, skeleton=True,
+                             error=str(_exc), queue_depth=_queue)
+                raise
+            if _packager and os.path.exists(_fbx):
+                _packager.submit(_fbx)
+            _events.finish(
+                _exp.name, secs=time.time() - _start, fbxs=[_fbx],
+                skeleton=True,
+                queue_depth=_queue,
+                package_queue=_packager.pending if _packager else 0)
+
+        for _group in _progress(_groups, title=_title, parent=parent):
+            print ' - EXPORTING GROUP', _group
+            _start = time.time()
+            _group_exports = [(_exp, _fbxs[_exp]) for _exp in _group]
+            for _exp, _fbx in _group_exports:
+                _queue -= 1
+                _events.emit('start', _exp.name, fbx=_fbx, frames=_frames,
+                             est_keys=_keys[_exp], queue_depth=_queue)
+            try:
+                _written = _export_group(
+                    _group_exports, range_=range_, roots=roots,
+                    add_border_keys=add_border_keys,
+                    bake_cams_in_world=bake_cams_in_world,
+                    animation_only=share_skeletons, events=_events,
+                    workers=bake_workers)
+            except Exception as _exc:
+                for _exp, _ in _group_exports:
+                    _events.emit('error', _exp.name, error=str(_exc),
+                                 queue_depth=_queue)
+                raise
+            _timings.append(_build_timing(
+                fbxs=[_fbx for _, _fbx, _ in _written], start=_start,
+                keys=sum([_keys[_exp] for _exp, _, _ in _written])))
+            _write_secs = dict([((_exp, _fbx), _secs)
+                                for _exp, _fbx, _secs in _written])
+            for _exp, _fbx in _group_exports:
+                if (_exp, _fbx) not in _write_secs:
+                    _events.emit('finish', _exp.name, skipped=True,
+                                 queue_depth=_queue)
+                    continue
+                if _packager and os.path.exists(_fbx):
+                    _packager.submit(_fbx)
+                _events.finish(
+                    _exp.name, secs=_write_secs[(_exp, _fbx)], fbxs=[_fbx],
+                    frames=_frames, est_keys=_keys[_exp], queue_depth=_queue,
+                    package_queue=_packager.pending if _packager else 0)
+    finally:
+        if _packager:
+            _packager.close()
+
+    # Write manifest of which skeleton each rig's anim belongs to
+    if _skeleton_fbxs:
+        _manifest = {}
+        for _exp, _fbx in _exports:
+            if isinstance(_exp, _Rig) and os.path.exists(_fbx):
+                _manifest[os.path.basename(_fbx)] = {
+                    'skeleton': os.path.basename(
+                        _skeleton_fbxs[_exp.source_file]),
+                    'source': _exp.source_file}
+        _manifest_json = _abs_path('{}/A_{}_skeletons.json'.format(
+            dir_, _Path(_cur_scene).basename))
+        print ' - WRITING SKELETON MANIFEST', _manifest_json
+        with open(_manifest_json, 'w') as _file:
+            json.dump(_manifest, _file, indent=4, sort_keys=True)
+
+    if timings:
+        _write_timings(_read_timings(timings) + _timings, timings)
+
+    if _packager:
+        return _packager.finish()
+
+
+def _export_group(exports, range_, roots=None, add_border_keys=True,
+                  bake_cams_in_world=True, animation_only=False,
+                  cleanup=True, events=None, workers=1):
+    """Export fbxs for a group of dependent exportables.
+
+    All of the group's nodes (world space camera duplicates, rig roots and
+    props) are baked in a single bakeResults simulation, so the timeline is
+    only evaluated once. The fbxs are then written with complex animation
+    baking turned off. The bake is done in an undo chunk which is undone
+    afterwards, so the scene is left unchanged.
+
+    If more than one worker is requested, world space cameras and rigs
+    are sampled by separate mayapy processes, each baking a segment of the
+    range, and the segments are then merged.
+
+    Args:
+        exports (tuple list): list of exportable/fbx path pairs
+        range_ (tuple): start/end frames
+        roots (str list): list of root nodes for rig exports
+        add_border_keys (bool): add start/end frame keys
+        bake_cams_in_world (bool): bake cameras in world space
+        animation_only (bool): only export animation for rigs
+        cleanup (bool): undo bake and clean tmp nodes
+        events (ExportEventLog): event log to emit bake/write stages to
+        workers (int): number of bake worker processes
+
+    Returns:
+        (tuple list): exportable/fbx/write secs for each fbx written
+    """
+    from maya import mel
+
+    print "EXPORT GROUP", [_exp for _exp, _ in exports]
+    _undo = cmds.undoInfo(query=True, state=True)
+    cmds.undoInfo(state=True)
+    cmds.undoInfo(openChunk=True, chunkName='fbx_export_bake')
+    _written = []
+    try:
+        _set_namespace(':export_tmp', clean=True)
 
+        # Find nodes to export, creating duplicate cams in world
+        _to_export = []
+        _cams = []
+        _dups = []
+        _cons = []
+        for _exp, _fbx in exports:
+            if isinstance(_exp, _Camera) and bake_cams_in_world:
+                _dup, _dup_cons = _exp.build_world_space_dup()
+                _cams.append(_exp)
+                _dups.append(_dup)
+                _cons += _dup_cons
+                _nodes = _dup.find_nodes()
+            elif isinstance(_exp, _Rig) and roots:
+                _nodes = _exp.find_root_nodes(roots)
+                if not _nodes:
+                    _notify('No root nodes exist in {}:\n\n   '
+                            '{}\n\nNothing was exported.'.format(
+                                _exp.namespace, '\n   '.join([
+                                    '{}:{}'.format(_exp.namespace, _root)
+                                    for _root in roots])),
+                            title='Warning')
+                    continue
+            else:
+                _nodes = _exp.find_nodes()
+            _to_export.append((_exp, _fbx, _nodes))
 
-def _fbx_export_selection(fbx, range_, add_border_keys=True):
+        # Bake anim
+        print ' - RANGE', range_
+        _start = time.time()
+        _worker_exps = []
+        _worker_rigs = []
+        if workers > 1:
+            for _exp, _, _nodes in _to_export:
+                if isinstance(_exp, _Rig):
+                    _worker_exps.append(_exp)
+                    _worker_rigs.append((_exp.namespace, _nodes))
+            _worker_exps += _cams
+        if _worker_exps:
+            _plugs = _find_bake_channels(_dups, rigs=_worker_rigs)
+            _segments = _bake_in_workers(
+                cams=_cams, rigs=_worker_rigs, range_=range_,
+                workers=workers)
+        _to_bake = []
+        for _exp, _, _nodes in _to_export:
+            if _exp not in _worker_exps:
+                _to_bake += _nodes
+        if _to_bake:
+            cmds.bakeResults(cmds.ls(_to_bake, dag=True), time=range_,
+                             simulation=True)
+        if _cons:
+            cmds.delete(_cons)
+        if _worker_exps:
+            _apply_bake(_merge_bake_segments(_segments), plugs=_plugs,
+                        start=range_[0])
+        _secs = max(time.time() - _start, 0.001)
+        _frames = int(range_[1] - range_[0] + 1)
+        if events:
+            events.emit(
+                'stage', None, stage='bake', secs=_secs, frames=_frames,
+                frames_per_sec=_frames/_secs,
+                exportables=[_exp.name for _exp, _, _ in _to_export])
+        mel.eval('DeleteAllStaticChannels')
+
+        # Write fbxs
+        for _exp, _fbx, _nodes in _to_export:
+            _start = time.time()
+            _exp.export_fbx(
+                fbx=_fbx, range_=range_, nodes=_nodes,
+                add_border_keys=add_border_keys, bake_anim=False,
+                animation_only=animation_only and isinstance(_exp, _Rig))
+            _secs = time.time() - _start
+            _written.append((_exp, _fbx, _secs))
+            if events:
+                events.emit(
+                    'stage', _exp.name, stage='write', secs=_secs,
+                    bytes=os.path.getsize(_fbx) if os.path.exists(_fbx)
+                    else 0)
+
+    finally:
+        try:
+            cmds.undoInfo(closeChunk=True)
+            if cleanup:
+                cmds.undo()
+                _set_namespace(':export_tmp', clean=True)
+            cmds.undoInfo(state=_undo)
+        finally:
+            _set_namespace(':')
+
+    return _written
+
+
+def _fbx_export_selection(fbx, range_, add_border_keys=True,
+                          animation_only=False, skeleton_only=False,
+                          bake_anim=True):
     """Execute fbx export of selected nodes.
 
     Args:
         fbx (str): path to export to
         range_ (tuple): export start/end range
         add_border_keys (bool): add start/end frame keys
+        animation_only (bool): only export animation
+        skeleton_only (bool): don't bake or export animation (eg. for
+            exporting skeleton and bind data)
+        bake_anim (bool): bake complex animation (disable if the nodes
+            have already been baked)
     """
+    from maya import mel
+
     print 'FBX EXPORT SELECTION'
     _nodes = cmds.ls(selection=True)
     print ' - NODES', _nodes
@@ -303,15 +963,83 @@ def _fbx_export_selection(fbx, range_, add_border_keys=True):
         'FBXExportSkins -v true;',
         'FBXExportTangents -v true;',
         'FBXExportSmoothMesh -v false;',
-        'FBXExportBakeComplexAnimation -v true;',
+        'FBXExportBakeComplexAnimation -v {bake};',
+        'FBXExportAnimationOnly -v {anim_only};',
+        'FBXProperty Export|IncludeGrp|Animation -v {anim};',
         'FBXExport -f "{fbx}" -s;',
-    ]).format(end=_start, start=_end, fbx=fbx)
+    ]).format(end=_start, start=_end, fbx=fbx,
+              bake=str(bake_anim and not skeleton_only).lower(),
+              anim_only=str(animation_only).lower(),
+              anim=str(not skeleton_only).lower())
     print _mel
     print cmds.ls(selection=True)
     cmds.loadPlugin('fbxmaya', quiet=True)
     mel.eval(_mel)
 
 
+def _find_anim_channels(nodes):
+    """Find animated channels on the given nodes.
+
+    A channel is considered animated if it's keyable and has an incoming
+    connection (eg. anim curve, constraint, expression).
+
+    Args:
+        nodes (str list): nodes to check
+
+    Returns:
+        (str list): animated channels
+    """
+    _chans = []
+    for _node in nodes:
+        _keyable = set(cmds.listAttr(_node, keyable=True) or [])
+        _conns = cmds.listConnections(
+            _node, source=True, destination=False, plugs=True,
+            connections=True) or []
+        _dests = set([_plug.split('.', 1)[1] for _plug in _conns[::2]])
+        _chans += ['{}.{}'.format(_node, _attr)
+                   for _attr in sorted(_keyable & _dests)]
+
+    return _chans
+
+
+def _find_bake_channels(cams, rigs=()):
+    """Find the channels which need baking on the given cameras and rigs.
+
+    Camera channels are keyed by camera index, node and attribute, and rig
+    channels by rig index, namespace relative node path and attribute, so
+    that channels sampled in a different maya session can be matched up.
+    Rig channels are found on the given nodes and their dag descendents,
+    which matches what bakeResults bakes.
+
+    Args:
+        cams (Camera list): cameras to check
+        rigs (tuple list): rig namespace/nodes pairs to check
+
+    Returns:
+        (dict): channel key/plug
+    """
+    _plugs = {}
+    for _idx, _cam in enumerate(cams):
+        for _node_type, _node in [('tfm', _cam.tfm), ('shp', _cam.shp)]:
+            for _chan in _find_anim_channels([_node]):
+                _key = '{:d}/{}/{}'.format(
+                    _idx, _node_type, _chan.split('.', 1)[1])
+                _plugs[_key] = _chan
+    for _idx, (_namespace, _nodes) in enumerate(rigs):
+        _prefix = _namespace+':'
+        _dag_nodes = []
+        if _nodes:
+            _dag_nodes = cmds.ls(_nodes, dag=True, long=True) or []
+        for _chan in _find_anim_channels(_dag_nodes):
+            _node, _attr = _chan.split('.', 1)
+            _rel_node = '|'.join([
+                _token[len(_prefix):] if _token.startswith(_prefix)
+                else _token for _token in _node.split('|')])
+            _plugs['{:d}/rig/{}/{}'.format(_idx, _rel_node, _attr)] = _chan
+
+    return _plugs
+
+
 def _find_cams(default=False):
     """Find cameras in the scene.
 
@@ -332,6 +1060,36 @@ def _find_cams(default=False):
     return _cams
 
 
+def _find_export_groups(exportables):
+    """Group exportables which share upstream nodes.
+
+    Exportables in the same group depend on each other (eg. a camera
+    constrained to a rig) so they should be baked in the same timeline
+    pass. Separate groups are independent, but are currently still
+    exported one after another in this session.
+
+    Args:
+        exportables (Exportable list): exportables to group
+
+    Returns:
+        (Exportable list list): list of groups
+    """
+    _groups = []
+    for _exp in exportables:
+        _exps = [_exp]
+        _nodes = _exp.find_upstream_nodes()
+        for _group in _groups[:]:
+            _group_exps, _group_nodes = _group
+            if not _group_nodes & _nodes:
+                continue
+            _groups.remove(_group)
+            _exps = _group_exps + _exps
+            _nodes |= _group_nodes
+        _groups.append((_exps, _nodes))
+
+    return [sorted(_group[0], key=exportables.index) for _group in _groups]
+
+
 def _find_rigs(roots, verbose=0):
     """Read references in the scene.
 
@@ -342,7 +1100,103 @@ def _find_rigs(roots, verbose=0):
     Returns:
         (FileRef list): list of refs
     """
-    _refs = []
+    return list(_iter_rigs(roots=roots, verbose=verbose))
+
+
+def _fit_timings(records, key):
+    """Fit a line to the given timing records against key count.
+
+    Args:
+        records (dict list): timing records
+        key (str): name of value to fit (eg. secs/bytes)
+
+    Returns:
+        (tuple|None): intercept/slope or None if there is no data
+    """
+    _points = [(_record['keys'], _record[key]) for _record in records]
+    if not _points:
+        return None
+    _n_points = float(len(_points))
+    _mean_x = sum([_x for _x, _ in _points])/_n_points
+    _mean_y = sum([_y for _, _y in _points])/_n_points
+    _var = sum([(_x-_mean_x)**2 for _x, _ in _points])
+    if not _var:
+        if not _mean_x:
+            return _mean_y, 0.0
+        return 0.0, _mean_y/_mean_x
+    _cov = sum([(_x-_mean_x)*(_y-_mean_y) for _x, _y in _points])
+    _slope = _cov/_var
+    return _mean_y - _slope*_mean_x, _slope
+
+
+def _get_ns(node):
+    """Get namespace of the given node.
+
+    Args:
+        node (str): node name
+
+    Returns:
+        (str): namespace
+    """
+    return str(node.split('|')[-1].split(':')[0])
+
+
+def _hash_fbx(path):
+    """Get an md5 of the given fbx's content.
+
+    Binary fbxs embed a creation timestamp, a file id and a footer code
+    which change on every export, so the top level nodes holding these and
+    the footer are left out of the hash. Other files are hashed in full.
+
+    Args:
+        path (str): path to fbx
+
+    Returns:
+        (str): md5 hex digest
+    """
+    _md5 = hashlib.md5()
+    with open(path, 'rb') as _file:
+        _header = _file.read(27)
+        if not _header.startswith(_FBX_MAGIC):
+            _md5.update(_header)
+            for _chunk in iter(functools.partial(_file.read, 1 << 20), b''):
+                _md5.update(_chunk)
+            return _md5.hexdigest()
+        _md5.update(_header)
+
+        # Read top level node records - fbx 7.5 uses 64 bit offsets
+        _version = struct.unpack('<I', _header[23:27])[0]
+        _fmt = '<QQQ' if _version >= 7500 else '<III'
+        _size = struct.calcsize(_fmt)
+        while True:
+            _pos = _file.tell()
+            _record = _file.read(_size+1)
+            if len(_record) < _size+1:
+                break
+            _end = struct.unpack(_fmt, _record[:_size])[0]
+            if _end <= _pos:  # Null record - footer follows
+                break
+            _name = _file.read(ord(_record[_size:]))
+            if _name not in _FBX_VOLATILE_NODES:
+                _file.seek(_pos)
+                _md5.update(_file.read(_end-_pos))
+            _file.seek(_end)
+
+    return _md5.hexdigest()
+
+
+def _iter_rigs(roots, verbose=0):
+    """Iterate rig references in the scene.
+
+    This allows an interface to display rigs as they are found.
+
+    Args:
+        roots (str list): list of valid skeleton root node names
+        verbose (int): print process data
+
+    Yields:
+        (FileRef): rig ref
+    """
     for _ref_node in cmds.ls(type='reference'):
 
         try:
@@ -373,21 +1227,7 @@ def _find_rigs(roots, verbose=0):
             continue
 
         _lprint(' - IS RIG', verbose=verbose)
-        _refs.append(_ref)
-
-    return _refs
-
-
-def _get_ns(node):
-    """Get namespace of the given node.
-
-    Args:
-        node (str): node name
-
-    Returns:
-        (str): namespace
-    """
-    return str(node.split('|')[-1].split(':')[0])
+        yield _ref
 
 
 def _lprint(*args, **kwargs):
@@ -401,6 +1241,32 @@ def _lprint(*args, **kwargs):
     print ' '.join([str(_arg) for _arg in args])
 
 
+def _read_timings(path):
+    """Read timing records from the given timing report.
+
+    The report is shared between processes, so an unreadable report is
+    ignored with a warning.
+
+    Args:
+        path (str): path to timing report
+
+    Returns:
+        (dict list): timing records
+    """
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path) as _file:
+            _records = json.load(_file)
+    except (IOError, ValueError) as _exc:
+        print ' - FAILED TO READ TIMINGS', path, _exc
+        return []
+    if not isinstance(_records, list):
+        print ' - BAD TIMINGS', path
+        return []
+    return _records
+
+
 def _set_namespace(namespace, clean=False):
     """Set current namespace, creating it if required.
 
@@ -421,10 +1287,43 @@ def _set_namespace(namespace, clean=False):
     cmds.namespace(setNamespace=_namespace)
 
 
+def _write_timings(records, path):
+    """Write timing records to the given timing report.
+
+    Only the most recent records are kept. The report is written to a
+    temporary file which is then renamed, so that other processes never
+    read a partly written report. Failures are reported but not raised.
+
+    Args:
+        records (dict list): timing records
+        path (str): path to timing report
+    """
+    _dir = os.path.dirname(path)
+    _tmp = '{}.{}.{:d}.tmp'.format(path, socket.gethostname(), os.getpid())
+    try:
+        if not os.path.exists(_dir):
+            try:
+                os.makedirs(_dir)
+            except OSError:  # Created by another process
+                if not os.path.isdir(_dir):
+                    raise
+        with open(_tmp, 'w') as _file:
+            json.dump(records[-_MAX_TIMINGS:], _file, indent=4)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)  # Rename can't replace on windows
+        os.rename(_tmp, path)
+    except (IOError, OSError) as _exc:
+        print ' - FAILED TO WRITE TIMINGS', path, _exc
+        if os.path.exists(_tmp):
+            os.remove(_tmp)
+
+
 class _Exportable(object):
     """Base class for any exportable."""
 
-    def export_fbx(self, fbx, range_, nodes=None, add_border_keys=True):
+    def export_fbx(self, fbx, range_, nodes=None, add_border_keys=True,
+                   animation_only=False, skeleton_only=False,
+                   bake_anim=True):
         """Export fbx to file.
 
         Args:
@@ -432,11 +1331,43 @@ class _Exportable(object):
             range_ (tuple): start/end frames
             nodes (str list): override list of nodes to export
             add_border_keys (bool): add start/end frame keys
+            animation_only (bool): only export animation
+            skeleton_only (bool): don't bake animation
+            bake_anim (bool): bake complex animation
         """
         _nodes = nodes or self.find_nodes()
         cmds.select(_nodes)
         _fbx_export_selection(
-            fbx=fbx, range_=range_, add_border_keys=add_border_keys)
+            fbx=fbx, range_=range_, add_border_keys=add_border_keys,
+            animation_only=animation_only, skeleton_only=skeleton_only,
+            bake_anim=bake_anim)
+
+    def find_upstream_nodes(self):
+        """Find transforms which this exportable's animation depends on.
+
+        This is this exportable's transforms, any animated or constrained
+        parents and any transforms driving them through constraints or
+        connections. Static parents are left out so that exportables which
+        only share an organisational group (eg. |CHARS) aren't grouped.
+
+        Returns:
+            (str set): long names of upstream transforms
+        """
+        _nodes = self.find_nodes()
+        _tfms = cmds.ls(_nodes, long=True, type='transform') or []
+        _upstream = set(_tfms)
+        _parents = set()
+        for _tfm in _tfms:
+            _tokens = _tfm.split('|')
+            for _idx in range(2, len(_tokens)):
+                _parents.add('|'.join(_tokens[:_idx]))
+        for _parent in sorted(_parents - _upstream):
+            if _find_anim_channels([_parent]):
+                _upstream.add(_parent)
+        _history = cmds.listHistory(_nodes) or []
+        _upstream |= set(
+            cmds.ls(_history, long=True, type='transform') or [])
+        return _upstream
 
     def __repr__(self):
         return '<{}:{}>'.format(type(self).__name__.strip('_'), self.name)
@@ -461,20 +1392,15 @@ class _Camera(_Exportable):
             return self.tfm.split(':')[0]
         return self.tfm
 
-    def export_fbx_in_world_space(
-            self, fbx, range_, add_border_keys=True, cleanup=True):
-        """Export fbx of this canera in world space.
+    def build_world_space_dup(self):
+        """Build a duplicate of this camera in world space.
 
-        Args:
-            fbx (str): fbx path
-            range_ (tuple): start/end frames
-            add_border_keys (bool): add start/end frame keys
-            cleanup (bool): clean tmp nodes
-        """
-        print "EXPORT CAM IN WORLD SPACE"
-        _set_namespace(':export_tmp', clean=True)
+        The duplicate is constrained to this camera and its shape attributes
+        are driven by this camera's shape, ready for baking.
 
-        # Create duplicate cam in world
+        Returns:
+            (tuple): duplicate camera, constraint nodes
+        """
         _dup = _Camera(cmds.duplicate(self.tfm)[0])
         if cmds.listRelatives(_dup.tfm, parent=True):
             cmds.parent(_dup.tfm, world=True)
@@ -492,16 +1418,21 @@ class _Camera(_Exportable):
         _s_cons = cmds.scaleConstraint(
             self.tfm, _dup.tfm, maintainOffset=False)[0]
 
-        # Bake anim
-        print ' - RANGE', range_
-        cmds.bakeResults([_dup.tfm, _dup.shp], time=range_)
-        cmds.delete(_p_cons, _s_cons)
-        mel.eval('DeleteAllStaticChannels')
-        _dup.export_fbx(
-            fbx=fbx, range_=range_, add_border_keys=add_border_keys)
-        if cleanup:
-            _set_namespace(':export_tmp', clean=True)
-        _set_namespace(':')
+        return _dup, [_p_cons, _s_cons]
+
+    def export_fbx_in_world_space(
+            self, fbx, range_, add_border_keys=True, cleanup=True):
+        """Export fbx of this canera in world space.
+
+        Args:
+            fbx (str): fbx path
+            range_ (tuple): start/end frames
+            add_border_keys (bool): add start/end frame keys
+            cleanup (bool): clean tmp nodes
+        """
+        _export_group(
+            [(self, fbx)], range_=range_, add_border_keys=add_border_keys,
+            cleanup=cleanup)
 
     def find_nodes(self):
         """Get nodes in this camera.
@@ -541,6 +1472,53 @@ class _Rig(_Exportable):
         """Get this ref's namespace."""
         return str(cmds.file(self._file, query=True, namespace=True))
 
+    @property
+    def source_file(self):
+        """Get this ref's file path (without copy number).
+
+        This is shared by all references of the same file.
+        """
+        return str(cmds.referenceQuery(
+            self.ref_node, filename=True, withoutCopyNumber=True))
+
+    def export_skeleton_fbx(self, fbx, range_, nodes=None):
+        """Export skeleton and bind data for this rig.
+
+        The bind pose is restored and the fbx is written without
+        animation. This is done in an undo chunk which is undone
+        afterwards, so the scene is left unchanged.
+
+        Args:
+            fbx (str): path to export to
+            range_ (tuple): start/end frames
+            nodes (str list): override list of nodes to export
+        """
+        _nodes = nodes or self.find_nodes()
+        _undo = cmds.undoInfo(query=True, state=True)
+        cmds.undoInfo(state=True)
+        cmds.undoInfo(openChunk=True, chunkName='fbx_export_skeleton')
+        try:
+            _joints = cmds.ls(_nodes, dag=True, type='joint')
+            _poses = set()
+            if _joints:
+                _poses = set(cmds.listConnections(
+                    _joints, type='dagPose', source=False) or [])
+            for _pose in sorted(_poses):
+                if not cmds.getAttr(_pose+'.bindPose'):
+                    continue
+                try:
+                    cmds.dagPose(_pose, restore=True)
+                except RuntimeError as _exc:
+                    print ' - FAILED TO RESTORE BIND POSE', _pose, _exc
+            self.export_fbx(fbx=fbx, range_=range_, nodes=_nodes,
+                            add_border_keys=False, skeleton_only=True)
+        finally:
+            try:
+                cmds.undoInfo(closeChunk=True)
+                cmds.undo()
+            finally:
+                cmds.undoInfo(state=_undo)
+
     def find_nodes(self):
         """Find nodes within this reference.
 
@@ -549,253 +1527,32 @@ class _Rig(_Exportable):
         """
         return cmds.ls(self.namespace+":*", referencedNodes=True)
 
-
-class _FbxExporterUi(object):
-    """Interface for exporter."""
-
-    def __init__(self, parent):
-        """Constructor.
+    def find_root_nodes(self, roots):
+        """Find root nodes which exist in this reference.
 
         Args:
-            parent (QDialog): parent dialog
-        """
-        self.main_layout = QtWidgets.QVBoxLayout(parent)
-        parent.setLayout(self.main_layout)
-
-        # Build elements
-        self._setup_path()
-        self._setup_roots()
-        self._setup_range()
-        self._setup_exportables()
-        self._setup_opts()
-        self._setup_export()
-
-        self._setup_settings()
-
-    def _setup_settings(self):
-        """Setup and load settings."""
-        _settings_file = _abs_path('{}/.qt_settings/{}.ini'.format(
-            tempfile.gettempdir(), type(self).__name__).strip('_'))
-        self._settings = QtCore.QSettings(
-            _settings_file, QtCore.QSettings.IniFormat)
-        self._save_attrs = [
-            'add_border_keys', 'bake_cams_in_world', 'path',
-            'show_default_cams', 'roots']
-        self.load_settings()
-
-    def _setup_path(self):
-        """Setup path line elements."""
-        _line = QtWidgets.QHBoxLayout()
-        self.main_layout.addLayout(_line)
-
-        _label = QtWidgets.QLabel('Folder')
-        _label.setMinimumSize(_MIN_W, _MIN_H)
-        _line.addWidget(_label)
-
-        self.path = QtWidgets.QLineEdit()
-        _line.addWidget(self.path)
-
-        self.browse = QtWidgets.QPushButton('Browse')
-        _line.addWidget(self.browse)
-
-    def _setup_roots(self):
-        """Setup root nodes line elements."""
-        _line = QtWidgets.QHBoxLayout()
-        self.main_layout.addLayout(_line)
-
-        _label = QtWidgets.QLabel('Roots')
-        _label.setMinimumSize(_MIN_W, _MIN_H)
-        _line.addWidget(_label)
-
-        self.roots = QtWidgets.QLineEdit()
-        self.roots.setText('JNT_Grp, Bind_Joint_GRP')
-        _line.addWidget(self.roots)
-
-    def _setup_range(self):
-        """Setup range line elements."""
-        _line = QtWidgets.QHBoxLayout()
-        self.main_layout.addLayout(_line)
-
-        _label = QtWidgets.QLabel('Range')
-        _label.setMinimumSize(_MIN_W, _MIN_H)
-
-        # Add start
-        _start = int(cmds.playbackOptions(query=True, minTime=True))
-        _line.addWidget(_label)
-        self.start = QtWidgets.QSpinBox()
-        self.start.setMaximum(9999999)
-        self.start.setValue(_start)
-        self.start.setMinimumSize(_MIN_W, _MIN_H)
-        _line.addWidget(self.start)
-
-        # Add end
-        _end = int(cmds.playbackOptions(query=True, maxTime=True))
-        self.end = QtWidgets.QSpinBox()
-        self.end.setMaximum(9999999)
-        self.end.setValue(_end)
-        self.end.setMinimumSize(_MIN_W, _MIN_H)
-        _line.addWidget(self.end)
-
-        _line.addStretch()
-
-    def _setup_exportables(self):
-        """Setup exportables list."""
-        self.exportables = QtWidgets.QListWidget()
-        self.exportables.setSelectionMode(
-            QtWidgets.QListWidget.ExtendedSelection)
-        self.main_layout.addWidget(self.exportables)
-
-    def _setup_opts(self):
-        """Setup camera options."""
-        self.show_default_cams = QtWidgets.QCheckBox('Show default cams')
-        self.show_default_cams.setChecked(False)
-        self.main_layout.addWidget(self.show_default_cams)
-
-        self.bake_cams_in_world = QtWidgets.QCheckBox('Bake cams in world')
-        self.bake_cams_in_world.setChecked(True)
-        self.main_layout.addWidget(self.bake_cams_in_world)
-
-        self.add_border_keys = QtWidgets.QCheckBox('Add start/end keys')
-        self.add_border_keys.setChecked(True)
-        self.add_border_keys.setToolTip('\n'.join([
-            "Maya's FBX exporter ignores keys outside the export range. ",
-            "This means that if your anim isn't keyed on the start/end ",
-            "frames then you could lose animation."
-        ]))
-        self.main_layout.addWidget(self.add_border_keys)
-
-    def _setup_export(self):
-        """Setup export button."""
-        self.export = QtWidgets.QPushButton('Export')
-        self.main_layout.addWidget(self.export)
-
-    def save_settings(self):
-        """Save interface settings."""
-        print 'SAVING SETTINGS'
-        for _attr in self._save_attrs:
-            _elem = getattr(self, _attr)
-            if isinstance(_elem, QtWidgets.QCheckBox):
-                _val = _elem.isChecked()
-            elif isinstance(_elem, QtWidgets.QLineEdit):
-                _val = _elem.text()
-            else:
-                raise ValueError(_val)
-            self._settings.setValue(_attr, _val)
-
-    def load_settings(self):
-        """Load interface settings."""
-        print 'LOADING SETTINGS'
-        for _attr in self._save_attrs:
-            _elem = getattr(self, _attr)
-            _val = self._settings.value(_attr)
-            if _val is None:
-                continue
-            print ' -', _attr, self._settings.value(_attr)
-            if isinstance(_elem, QtWidgets.QCheckBox):
-                _val = {'true': True, 'false': False}.get(_val, _val)
-                if isinstance(_val, bool):
-                    _elem.setChecked(_val)
-            elif isinstance(_elem, QtWidgets.QLineEdit):
-                _elem.setText(_val)
-            else:
-                raise ValueError(_val)
-
-
-class _FbxExporter(QtWidgets.QDialog):
-    """Tool for batch exporting cams/refs to fbx."""
-
-    def __init__(self):
-        """Constructor."""
-        super(_FbxExporter, self).__init__()
-        self.default_path = _abs_path(
-            '{}/Documents'.format(os.path.expanduser("~")))
-        self.setup_ui()
-        self._redraw__exportables()
-
-    def setup_ui(self):
-        """Build ui elements."""
-        self.ui = _FbxExporterUi(self)
-        if not self.ui.path.text() or not os.path.exists(self.ui.path.text()):
-            self.ui.path.setText(self.default_path)
-
-        # Connect callbacks
-        self.ui.show_default_cams.stateChanged.connect(
-            self._redraw__exportables)
-        self.ui.browse.clicked.connect(
-            self._callback__browse)
-        self.ui.export.clicked.connect(
-            self._callback__export)
-        self.ui.roots.textChanged.connect(
-            self._redraw__exportables)
-
-        self.resize(468, 326)
-        self.setWindowTitle("Camera/anim fbx exporter")
-        self.show()
-
-    def _redraw__exportables(self):
-
-        self.ui.exportables.clear()
-
-        _show_default_cams = self.ui.show_default_cams.isChecked()
-        for _cam in _find_cams(default=_show_default_cams):
-            _item = QtWidgets.QListWidgetItem(_cam.name)
-            _item.setForeground(QtGui.QColor('Yellow'))
-            _item.setData(Qt.UserRole, _cam)
-            self.ui.exportables.addItem(_item)
-
-        _roots = re.split('[ ,]', self.ui.roots.text())
-        for _ref in _find_rigs(roots=_roots):
-            _item = QtWidgets.QListWidgetItem(_ref.name)
-            _item.setForeground(QtGui.QColor('Aquamarine'))
-            _item.setData(Qt.UserRole, _ref)
-            self.ui.exportables.addItem(_item)
-
-    def _callback__browse(self):
-
-        _dialog = QtWidgets.QFileDialog()
-        _dialog.setOption(_dialog.ShowDirsOnly)
-        _dialog.setDirectory(self.default_path)
-        _dir = _dialog.getExistingDirectory()
-        if _dir:
-            self.ui.path.setText(_dir)
-            self.ui.save_settings()
-
-    def _callback__export(self):
-
-        self.ui.save_settings()
-
-        _dir = _abs_path(self.ui.path.text())
-        _start = self.ui.start.value()
-        _end = self.ui.end.value()
-        _bake_cams_in_world = self.ui.bake_cams_in_world.isChecked()
-        _add_border_keys = self.ui.add_border_keys.isChecked()
-        _exportables = [_item.data(Qt.UserRole)
-                        for _item in self.ui.exportables.selectedItems()]
-        _roots = re.split('[ ,]', self.ui.roots.text())
-
-        _export_fbxs(exportables=_exportables, range_=(_start, _end),
-                     dir_=_dir, bake_cams_in_world=_bake_cams_in_world,
-                     add_border_keys=_add_border_keys, parent=self,
-                     roots=_roots)
-
-    def closeEvent(self, event):
-        """Triggered by close interface.
+            roots (str list): list of root node names
 
-        Args:
-            event (QEvent): close event
+        Returns:
+            (str list): list of nodes
         """
-        print 'CLOSING INTERFACE'
-        self.ui.save_settings()
+        _possible_nodes = [
+            '{}:{}'.format(self.namespace, _root) for _root in roots]
+        return [_node for _node in _possible_nodes if cmds.objExists(_node)]
 
 
 def launch_fbx_exporter(path=None, roots=None):
     """Launch export dialog.
 
+    The interface is imported here so that Qt is only loaded if the dialog
+    is needed.
+
     Args:
         path (str): default dialog path
         roots (str): override roots list
     """
     global DIALOG
+    from fbx_exporter_v008_ui import _FbxExporter
 
     DIALOG = _FbxExporter()
     if path:
@@ -806,5 +1563,67 @@ def launch_fbx_exporter(path=None, roots=None):
     return DIALOG
 
 
+def add_event_callback(func):
+    """Add a callback to receive export events.
+
+    The callback is passed each event dict as it is emitted.
+
+    Args:
+        func (fn): callback to add
+    """
+    if func not in _EVENT_CALLBACKS:
+        _EVENT_CALLBACKS.append(func)
+
+
+def remove_event_callback(func):
+    """Remove an export event callback.
+
+    Args:
+        func (fn): callback to remove
+    """
+    if func in _EVENT_CALLBACKS:
+        _EVENT_CALLBACKS.remove(func)
+
+
+def iter_events(path=_EVENTS_LOG, follow=False, poll=1.0):
+    """Iterate events in an export event log.
+
+    Args:
+        path (str): path to event log
+        follow (bool): wait for new events (like tail -f), reopening the
+            log if it's rotated
+        poll (float): time to wait between checks for new events
+
+    Yields:
+        (dict): event data
+    """
+    _file = None
+    while True:
+        if not _file and os.path.exists(path):
+            _file = open(path)
+            _ino = os.fstat(_file.fileno()).st_ino
+        if _file:
+            _line = _file.readline()
+            if _line.endswith('\n'):
+                yield json.loads(_line)
+                continue
+            _file.seek(-len(_line), os.SEEK_CUR)
+
+            # Check for rotation
+            if (
+                    not os.path.exists(path) or
+                    os.stat(path).st_ino != _ino or
+                    os.path.getsize(path) < _file.tell()):
+                _file.close()
+                _file = None
+                if follow:
+                    continue
+        if not follow:
+            break
+        time.sleep(poll)
+    if _file:
+        _file.close()
+
+
 if __name__ == '__main__':
     launch_fbx_exporter()
@@ -0,0 +1,138 @@
+"""Maya independent helpers for merging frame-parallel bakes.
+
+These are kept separate from the export tools so that they can be used
+and tested outside of maya.
+
+Author: Henry van der Beek (ninhenzo64@gmail.com)
+Release: v008
+"""
+
+
+def _euler_filter(rots):
+    """Make a sequence of euler rotations continuous.
+
+    Each rotation is unwrapped to be within 180 degrees of the previous
+    one, and is replaced with its equivalent flipped rotation (x+180,
+    180-y, z+180) if that is closer.
+
+    Args:
+        rots (tuple list): list of x/y/z rotations in degrees
+
+    Returns:
+        (tuple list): filtered rotations
+    """
+    _filtered = []
+    for _rot in rots:
+        if not _filtered:
+            _filtered.append(tuple(_rot))
+            continue
+        _prev = _filtered[-1]
+        _flip = (_rot[0]+180, 180-_rot[1], _rot[2]+180)
+        _options = []
+        for _option in [_rot, _flip]:
+            _option = tuple([_unwrap(_val, _prev_val)
+                             for _val, _prev_val in zip(_option, _prev)])
+            _dist = sum([abs(_val - _prev_val)
+                         for _val, _prev_val in zip(_option, _prev)])
+            _options.append((_dist, _option))
+        _filtered.append(min(_options)[1])
+
+    return _filtered
+
+
+def _merge_bake_segments(segments):
+    """Merge baked segments into a continuous set of channels.
+
+    The segments must cover a continuous range of frames and all sample
+    the same channels. Rotation
+    channels are euler filtered across the whole range, so any flips or
+    360 degree jumps between segments are removed.
+
+    Args:
+        segments (dict list): segments, each with range and channels data
+
+    Returns:
+        (dict): channel key/values
+    """
+    _segments = sorted(segments, key=lambda _segment: _segment['range'][0])
+    _channels = {}
+    for _idx, _segment in enumerate(_segments):
+        _start, _end = _segment['range']
+        if _idx and _start != _segments[_idx-1]['range'][1]+1:
+            raise ValueError('Segments are not continuous {} {}'.format(
+                _segments[_idx-1]['range'], _segment['range']))
+        if _idx and set(_segment['channels']) != set(_channels):
+            raise ValueError('Segment channels do not match {} {}'.format(
+                _segments[0]['range'], _segment['range']))
+        for _key, _values in _segment['channels'].items():
+            if len(_values) != _end - _start + 1:
+                raise ValueError('Bad value count {} {:d}'.format(
+                    _key, len(_values)))
+            _channels.setdefault(_key, []).extend(_values)
+    if _segments:
+        _frames = _segments[-1]['range'][1] - _segments[0]['range'][0] + 1
+        for _key, _values in _channels.items():
+            if len(_values) != _frames:
+                raise ValueError('Bad value count {} {:d}'.format(
+                    _key, len(_values)))
+
+    # Apply euler filter to full rotations
+    _filtered = set()
+    for _key in list(_channels):
+        if not _key.endswith('/rotateX'):
+            continue
+        _rot_keys = [_key[:-1]+_axis for _axis in 'XYZ']
+        if not all([_rot_key in _channels for _rot_key in _rot_keys]):
+            continue
+        _rots = _euler_filter(list(zip(*[_channels[_rot_key]
+                                         for _rot_key in _rot_keys])))
+        for _rot_key, _values in zip(_rot_keys, zip(*_rots)):
+            _channels[_rot_key] = list(_values)
+        _filtered |= set(_rot_keys)
+
+    # Unwrap any other rotation channels
+    for _key in list(_channels):
+        if (
+                _key in _filtered or
+                _key[-7:] not in ['rotateX', 'rotateY', 'rotateZ']):
+            continue
+        _values = _channels[_key]
+        for _idx in range(1, len(_values)):
+            _values[_idx] = _unwrap(_values[_idx], _values[_idx-1])
+
+    return _channels
+
+
+def _split_range(range_, count):
+    """Split a frame range into continuous segments.
+
+    Args:
+        range_ (tuple): start/end frames
+        count (int): number of segments
+
+    Returns:
+        (tuple list): start/end frames of each segment
+    """
+    _start, _end = [int(_frame) for _frame in range_]
+    _frames = _end - _start + 1
+    _count = max(1, min(count, _frames))
+    _segments = []
+    for _idx in range(_count):
+        _seg_start = _start + _frames*_idx//_count
+        _seg_end = _start + _frames*(_idx+1)//_count - 1
+        _segments.append((_seg_start, _seg_end))
+
+    return _segments
+
+
+def _unwrap(value, ref):
+    """Offset an angle by multiples of 360 to be closest to a reference.
+
+    Args:
+        value (float): angle in degrees
+        ref (float): reference angle in degrees
+
+    Returns:
+        (float): unwrapped angle
+    """
+    return value + 360.0*round((ref - value)/360.0)
@@ -0,0 +1,433 @@
+"""Interface for exporting selected references to fbx.
+
+This is kept separate from the export tools so that batch exports don't
+need to load Qt.
+
+Author: Henry van der Beek (ninhenzo64@gmail.com)
+Release: v008
+"""
+
+import os
+import re
+import tempfile
+
+from maya import cmds
+from PySide2 import QtWidgets, QtGui, QtCore
+from PySide2.QtCore import Qt
+
+from fbx_exporter_v008 import (
+    _abs_path, _estimate_exports, _export_fbxs, _find_cams, _iter_rigs,
+    _notify)
+
+_MIN_W = 60
+_MIN_H = 20
+
+
+class _MessageBox(QtWidgets.QMessageBox):
+    """Simple message box interface."""
+
+    def __init__(self, text, title, buttons):
+        """Constructor.
+
+        Args:
+            text (str): message to display
+            title (str): title for the interface
+            buttons (str list): buttons to show
+        """
+        super(_MessageBox, self).__init__()
+        self.setWindowTitle(title)
+        self.setText(text)
+        self.buttons = self._add_buttons(buttons)
+
+    def _add_buttons(self, buttons):
+        """Add the buttons to the interface.
+
+        Args:
+            buttons (str list): buttons to show
+        """
+        _buttons = list(buttons)
+
+        # Create buttons
+        _btn_map = {}
+        for _button in _buttons:
+            _btn_map[_button] = self.addButton(
+                _button, QtWidgets.QMessageBox.AcceptRole)
+
+        # Make sure we have cancel behaviour
+        if "Cancel" not in _btn_map:
+            _btn_map["Cancel"] = self.addButton(
+                "Cancel", QtWidgets.QMessageBox.AcceptRole)
+            _btn_map["Cancel"].hide()
+            _buttons += ["Cancel"]
+        print _btn_map
+        self.setEscapeButton(_btn_map["Cancel"])
+        self.setDefaultButton(_btn_map["Cancel"])
+
+        return _buttons
+
+    def get_result(self):
+        """Read the result of the dialog."""
+        _exec_result = self.exec_()
+        _result = self.buttons[_exec_result]
+        if _result == "Cancel":
+            raise RuntimeError
+        return _result
+
+
+class _ProgressBar(object):
+    """Iterator which shows a progress bar dialog."""
+
+    def __init__(self, items, title='Progress', parent=None):
+        """Constructor.
+
+        Args:
+            items (list): items to iterate
+            title (str): progress bar title
+            parent (QDialog): parent interface
+        """
+        self.items = items[:]
+        self.n_items = len(self.items)
+
+        _args = [parent] if parent else []
+        self.progress = QtWidgets.QProgressBar(*_args)
+
+        self.progress.show()
+        self.progress.setValue(0)
+        self.progress.resize(300, 50)
+        self.progress.setWindowTitle(title)
+        if parent:
+            _pos = (parent.geometry().center() -
+                    parent.geometry().topLeft() -
+                    self.progress.geometry().center())
+            # print parent.geometry().center()
+            # print self.progress.geometry().center()
+            self.progress.move(_pos)
+
+        self.app = QtWidgets.QApplication.instance()
+
+    def next(self):
+        """Get the next iteration.
+
+        Returns:
+            (any): next item
+        """
+        self.app.processEvents()
+        if not self.items:
+            self.progress.close()
+            raise StopIteration
+        _next = self.items.pop(0)
+        _fr = 1.0 - 1.0*len(self.items)/self.n_items
+        self.progress.setValue(_fr*100)
+        return _next
+
+    def __iter__(self):
+        return self
+
+
+class _FbxExporterUi(object):
+    """Interface for exporter."""
+
+    def __init__(self, parent):
+        """Constructor.
+
+        Args:
+            parent (QDialog): parent dialog
+        """
+        self.main_layout = QtWidgets.QVBoxLayout(parent)
+        parent.setLayout(self.main_layout)
+
+        # Build elements
+        self._setup_path()
+        self._setup_roots()
+        self._setup_range()
+        self._setup_exportables()
+        self._setup_opts()
+        self._setup_export()
+
+        self._setup_settings()
+
+    def _setup_settings(self):
+        """Setup and load settings."""
+        _settings_file = _abs_path('{}/.qt_settings/{}.ini'.format(
+            tempfile.gettempdir(), type(self).__name__).strip('_'))
+        self._settings = QtCore.QSettings(
+            _settings_file, QtCore.QSettings.IniFormat)
+        self._save_attrs = [
+            'add_border_keys', 'bake_cams_in_world', 'path',
+            'show_default_cams', 'roots', 'package', 'share_skeletons']
+        self.load_settings()
+
+    def _setup_path(self):
+        """Setup path line elements."""
+        _line = QtWidgets.QHBoxLayout()
+        self.main_layout.addLayout(_line)
+
+        _label = QtWidgets.QLabel('Folder')
+        _label.setMinimumSize(_MIN_W, _MIN_H)
+        _line.addWidget(_label)
+
+        self.path = QtWidgets.QLineEdit()
+        _line.addWidget(self.path)
+
+        self.browse = QtWidgets.QPushButton('Browse')
+        _line.addWidget(self.browse)
+
+    def _setup_roots(self):
+        """Setup root nodes line elements."""
+        _line = QtWidgets.QHBoxLayout()
+        self.main_layout.addLayout(_line)
+
+        _label = QtWidgets.QLabel('Roots')
+        _label.setMinimumSize(_MIN_W, _MIN_H)
+        _line.addWidget(_label)
+
+        self.roots = QtWidgets.QLineEdit()
+        self.roots.setText('JNT_Grp, Bind_Joint_GRP')
+        _line.addWidget(self.roots)
+
+    def _setup_range(self):
+        """Setup range line elements."""
+        _line = QtWidgets.QHBoxLayout()
+        self.main_layout.addLayout(_line)
+
+        _label = QtWidgets.QLabel('Range')
+        _label.setMinimumSize(_MIN_W, _MIN_H)
+
+        # Add start
+        _start = int(cmds.playbackOptions(query=True, minTime=True))
+        _line.addWidget(_label)
+        self.start = QtWidgets.QSpinBox()
+        self.start.setMaximum(9999999)
+        self.start.setValue(_start)
+        self.start.setMinimumSize(_MIN_W, _MIN_H)
+        _line.addWidget(self.start)
+
+        # Add end
+        _end = int(cmds.playbackOptions(query=True, maxTime=True))
+        self.end = QtWidgets.QSpinBox()
+        self.end.setMaximum(9999999)
+        self.end.setValue(_end)
+        self.end.setMinimumSize(_MIN_W, _MIN_H)
+        _line.addWidget(self.end)
+
+        _line.addStretch()
+
+    def _setup_exportables(self):
+        """Setup exportables list."""
+        self.exportables = QtWidgets.QListWidget()
+        self.exportables.setSelectionMode(
+            QtWidgets.QListWidget.ExtendedSelection)
+        self.main_layout.addWidget(self.exportables)
+
+    def _setup_opts(self):
+        """Setup camera options."""
+        self.show_default_cams = QtWidgets.QCheckBox('Show default cams')
+        self.show_default_cams.setChecked(False)
+        self.main_layout.addWidget(self.show_default_cams)
+
+        self.bake_cams_in_world = QtWidgets.QCheckBox('Bake cams in world')
+        self.bake_cams_in_world.setChecked(True)
+        self.main_layout.addWidget(self.bake_cams_in_world)
+
+        self.add_border_keys = QtWidgets.QCheckBox('Add start/end keys')
+        self.add_border_keys.setChecked(True)
+        self.add_border_keys.setToolTip('\n'.join([
+            "Maya's FBX exporter ignores keys outside the export range. ",
+            "This means that if your anim isn't keyed on the start/end ",
+            "frames then you could lose animation."
+        ]))
+        self.main_layout.addWidget(self.add_border_keys)
+
+        self.package = QtWidgets.QCheckBox('Package fbxs')
+        self.package.setChecked(False)
+        self.package.setToolTip('\n'.join([
+            "Compress the exported fbxs into a zip archive in the export ",
+            "folder. Only fbxs which have changed since the last export ",
+            "are recompressed."
+        ]))
+        self.main_layout.addWidget(self.package)
+
+        self.share_skeletons = QtWidgets.QCheckBox('Share rig skeletons')
+        self.share_skeletons.setChecked(False)
+        self.share_skeletons.setToolTip('\n'.join([
+            "Export the skeleton once for each rig file (SK_<rig>_<id>.fbx) ",
+            "and only export animation for each reference of that rig. A ",
+            "manifest lists which skeleton each animation fbx belongs to."
+        ]))
+        self.main_layout.addWidget(self.share_skeletons)
+
+    def _setup_export(self):
+        """Setup export buttons."""
+        _line = QtWidgets.QHBoxLayout()
+        self.main_layout.addLayout(_line)
+
+        self.dry_run = QtWidgets.QPushButton('Dry run')
+        self.dry_run.setToolTip(
+            'Estimate export cost without writing any files')
+        _line.addWidget(self.dry_run)
+
+        self.export = QtWidgets.QPushButton('Export')
+        _line.addWidget(self.export)
+
+    def save_settings(self):
+        """Save interface settings."""
+        print 'SAVING SETTINGS'
+        for _attr in self._save_attrs:
+            _elem = getattr(self, _attr)
+            if isinstance(_elem, QtWidgets.QCheckBox):
+                _val = _elem.isChecked()
+            elif isinstance(_elem, QtWidgets.QLineEdit):
+                _val = _elem.text()
+            else:
+                raise ValueError(_val)
+            self._settings.setValue(_attr, _val)
+
+    def load_settings(self):
+        """Load interface settings."""
+        print 'LOADING SETTINGS'
+        for _attr in self._save_attrs:
+            _elem = getattr(self, _attr)
+            _val = self._settings.value(_attr)
+            if _val is None:
+                continue
+            print ' -', _attr, self._settings.value(_attr)
+            if isinstance(_elem, QtWidgets.QCheckBox):
+                _val = {'true': True, 'false': False}.get(_val, _val)
+                if isinstance(_val, bool):
+                    _elem.setChecked(_val)
+            elif isinstance(_elem, QtWidgets.QLineEdit):
+                _elem.setText(_val)
+            else:
+                raise ValueError(_val)
+
+
+class _FbxExporter(QtWidgets.QDialog):
+    """Tool for batch exporting cams/refs to fbx."""
+
+    def __init__(self):
+        """Constructor."""
+        super(_FbxExporter, self).__init__()
+        self.default_path = _abs_path(
+            '{}/Documents'.format(os.path.expanduser("~")))
+        self._rigs = None
+        self._rigs_timer = QtCore.QTimer(self)
+        self._rigs_timer.timeout.connect(self._callback__add_next_rig)
+        self.setup_ui()
+
+        # Populate exportables after dialog is drawn
+        QtCore.QTimer.singleShot(0, self._redraw__exportables)
+
+    def setup_ui(self):
+        """Build ui elements."""
+        self.ui = _FbxExporterUi(self)
+        if not self.ui.path.text() or not os.path.exists(self.ui.path.text()):
+            self.ui.path.setText(self.default_path)
+
+        # Connect callbacks
+        self.ui.show_default_cams.stateChanged.connect(
+            self._redraw__exportables)
+        self.ui.browse.clicked.connect(
+            self._callback__browse)
+        self.ui.export.clicked.connect(
+            self._callback__export)
+        self.ui.dry_run.clicked.connect(
+            self._callback__dry_run)
+        self.ui.roots.textChanged.connect(
+            self._redraw__exportables)
+
+        self.resize(468, 326)
+        self.setWindowTitle("Camera/anim fbx exporter")
+        self.show()
+
+    def _redraw__exportables(self):
+
+        self.ui.exportables.clear()
+
+        _show_default_cams = self.ui.show_default_cams.isChecked()
+        for _cam in _find_cams(default=_show_default_cams):
+            _item = QtWidgets.QListWidgetItem(_cam.name)
+            _item.setForeground(QtGui.QColor('Yellow'))
+            _item.setData(Qt.UserRole, _cam)
+            self.ui.exportables.addItem(_item)
+
+        # Rigs are slow to find so add them one at a time on idle
+        _roots = re.split('[ ,]', self.ui.roots.text())
+        self._rigs = _iter_rigs(roots=_roots)
+        self._rigs_timer.start(0)
+
+    def _callback__add_next_rig(self):
+
+        try:
+            _ref = next(self._rigs)
+        except StopIteration:
+            self._rigs_timer.stop()
+            return
+        _item = QtWidgets.QListWidgetItem(_ref.name)
+        _item.setForeground(QtGui.QColor('Aquamarine'))
+        _item.setData(Qt.UserRole, _ref)
+        self.ui.exportables.addItem(_item)
+
+    def _callback__browse(self):
+
+        _dialog = QtWidgets.QFileDialog()
+        _dialog.setOption(_dialog.ShowDirsOnly)
+        _dialog.setDirectory(self.default_path)
+        _dir = _dialog.getExistingDirectory()
+        if _dir:
+            self.ui.path.setText(_dir)
+            self.ui.save_settings()
+
+    def _callback__dry_run(self):
+
+        _start = self.ui.start.value()
+        _end = self.ui.end.value()
+        _exportables = [_item.data(Qt.UserRole)
+                        for _item in self.ui.exportables.selectedItems()]
+        _roots = re.split('[ ,]', self.ui.roots.text())
+        if not _exportables:
+            _notify('Nothing selected to export')
+            return
+
+        _estimates = _estimate_exports(
+            exportables=_exportables, range_=(_start, _end), roots=_roots)
+        _lines = []
+        for _estimate in _estimates:
+            _line = '{}: {:d} channels, {:d} keys'.format(
+                _estimate['exportable'], _estimate['channels'],
+                _estimate['keys'])
+            if _estimate['secs'] is not None:
+                _line += ', ~{:.01f}s, ~{:.01f}MB'.format(
+                    _estimate['secs'], _estimate['bytes']/1000000.0)
+            _lines.append(_line)
+        _notify('\n'.join(_lines), title='Dry run')
+
+    def _callback__export(self):
+
+        self.ui.save_settings()
+
+        _dir = _abs_path(self.ui.path.text())
+        _start = self.ui.start.value()
+        _end = self.ui.end.value()
+        _bake_cams_in_world = self.ui.bake_cams_in_world.isChecked()
+        _add_border_keys = self.ui.add_border_keys.isChecked()
+        _package = self.ui.package.isChecked()
+        _share_skeletons = self.ui.share_skeletons.isChecked()
+        _exportables = [_item.data(Qt.UserRole)
+                        for _item in self.ui.exportables.selectedItems()]
+        _roots = re.split('[ ,]', self.ui.roots.text())
+
+        _export_fbxs(exportables=_exportables, range_=(_start, _end),
+                     dir_=_dir, bake_cams_in_world=_bake_cams_in_world,
+                     add_border_keys=_add_border_keys, parent=self,
+                     roots=_roots, package=_package,
+                     share_skeletons=_share_skeletons)
+
+    def closeEvent(self, event):
+        """Triggered by close interface.
+
+        Args:
+            event (QEvent): close event
+        """
+        print 'CLOSING INTERFACE'
+        self._rigs_timer.stop()
+        self.ui.save_settings()
@@ -0,0 +1,574 @@
+"""Tests for fbx_exporter_v008.
+
+Maya isn't available outside of maya, so empty maya/maya.cmds/maya.mel
+stub modules are installed before import. Tests which exercise code that
+calls maya swap in a _Cmds recorder for fbx_exporter_v008.cmds.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import types
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+if 'maya' not in sys.modules:
+    sys.modules['maya'] = types.ModuleType('maya')
+    for _name in ['cmds', 'mel']:
+        sys.modules['maya.'+_name] = types.ModuleType('maya.'+_name)
+        setattr(sys.modules['maya'], _name, sys.modules['maya.'+_name])
+    sys.modules['maya.mel'].eval = lambda *args: None
+
+import fbx_exporter_v008  # noqa: E402
+
+
+def _build_fbx(nodes, footer=b''):
+    """Build a binary fbx (v7400) from the given top level nodes.
+
+    Args:
+        nodes (tuple list): list of node name/data pairs
+        footer (bytes): data to append after null record
+
+    Returns:
+        (bytes): fbx data
+    """
+    _data = fbx_exporter_v008._FBX_MAGIC + b'\x1a\x00' + struct.pack(
+        '<I', 7400)
+    for _name, _payload in nodes:
+        _end = len(_data) + 13 + len(_name) + len(_payload)
+        _data += struct.pack('<IIIB', _end, 0, 0, len(_name))
+        _data += _name + _payload
+    return _data + b'\x00'*13 + footer
+
+
+class _Cmds(object):
+    """Records maya commands, returning the first arg for ls.
+
+    Results for other commands can be provided as functions.
+    """
+
+    def __init__(self, **funcs):
+        self.calls = []
+        self.funcs = funcs
+
+    def __getattr__(self, name):
+        def _cmd(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            if name in self.funcs:
+                return self.funcs[name](*args, **kwargs)
+            if name == 'ls':
+                return list(args[0])
+            if name == 'undoInfo':
+                return True
+            return None
+        return _cmd
+
+
+class _FakeExportable(fbx_exporter_v008._Exportable):
+    """Exportable which records fbx writes."""
+
+    name = None
+
+    def __init__(self, name, nodes):
+        self.name = name
+        self.nodes = nodes
+        self.writes = []
+
+    def find_nodes(self):
+        return self.nodes
+
+    def export_fbx(self, **kwargs):
+        self.writes.append(kwargs)
+        if os.path.isabs(kwargs['fbx']):
+            with open(kwargs['fbx'], 'w') as _file:
+                _file.write(self.name)
+
+
+class _FakeCam(_FakeExportable, fbx_exporter_v008._Camera):
+
+    def build_world_space_dup(self):
+        return _FakeExportable('dup', ['dup_'+self.name]), ['cons']
+
+
+class _FakeRig(_FakeExportable, fbx_exporter_v008._Rig):
+
+    namespace = 'rig'
+    source_file = None
+
+    def find_root_nodes(self, roots):
+        return [self.namespace+':'+_root for _root in roots]
+
+
+class _FakeUpstream(object):
+    """Exportable with fixed upstream nodes."""
+
+    def __init__(self, name, upstream):
+        self.name = name
+        self.upstream = set(upstream)
+
+    def find_upstream_nodes(self):
+        return set(self.upstream)
+
+    def __repr__(self):
+        return self.name
+
+
+class TestExportGroups(unittest.TestCase):
+
+    def test_transitive(self):
+        _a = _FakeUpstream('a', ['|a', '|x'])
+        _b = _FakeUpstream('b', ['|b', '|x', '|y'])
+        _c = _FakeUpstream('c', ['|c', '|y'])
+        _d = _FakeUpstream('d', ['|d'])
+        self.assertEqual(
+            fbx_exporter_v008._find_export_groups([_a, _b, _c, _d]),
+            [[_a, _b, _c], [_d]])
+
+    def test_bridge(self):
+        _a = _FakeUpstream('a', ['|a'])
+        _b = _FakeUpstream('b', ['|b'])
+        _c = _FakeUpstream('c', ['|a', '|b'])
+        self.assertEqual(
+            fbx_exporter_v008._find_export_groups([_a, _b, _c]),
+            [[_a, _b, _c]])
+
+    def test_independent(self):
+        _exps = [_FakeUpstream(_name, ['|'+_name]) for _name in 'abc']
+        self.assertEqual(
+            fbx_exporter_v008._find_export_groups(_exps),
+            [[_exp] for _exp in _exps])
+
+    def test_static_parents_ignored(self):
+        _anim = '|CHARS|anim_grp'
+
+        def _list_connections(node, **kwargs):
+            if node == _anim:
+                return [_anim+'.translateX', 'anim_curve.output']
+            return []
+
+        _cmds = _Cmds(
+            ls=lambda nodes, **kwargs: [
+                '{}|{}'.format(_anim, _node) for _node in nodes],
+            listAttr=lambda node, **kwargs: ['translateX'],
+            listConnections=_list_connections,
+            listHistory=lambda nodes, **kwargs: [])
+        _orig_cmds = fbx_exporter_v008.cmds
+        fbx_exporter_v008.cmds = _cmds
+        try:
+            _upstream = _FakeExportable(
+                'rig', ['rig:root']).find_upstream_nodes()
+        finally:
+            fbx_exporter_v008.cmds = _orig_cmds
+        self.assertEqual(_upstream, set([_anim, _anim+'|rig:root']))
+
+
+class TestExportEventLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        del fbx_exporter_v008._EVENT_CALLBACKS[:]
+
+    def test_callback_error(self):
+        _events = []
+
+        def _bad_callback(event):
+            raise ValueError(event)
+
+        fbx_exporter_v008.add_event_callback(_bad_callback)
+        fbx_exporter_v008.add_event_callback(_events.append)
+        _log = '{}/events.log'.format(self.dir)
+        _event = fbx_exporter_v008._ExportEventLog(path=_log).emit(
+            'start', 'cam')
+        self.assertEqual(_events, [_event])
+        self.assertEqual(list(fbx_exporter_v008.iter_events(_log)),
+                         [_event])
+
+    def test_write_error(self):
+        _events = []
+        fbx_exporter_v008.add_event_callback(_events.append)
+        _log = fbx_exporter_v008._ExportEventLog(
+            path='{}/events.log'.format(self.dir))
+        os.mkdir(_log.path)  # Makes write fail
+        _log.emit('start', 'cam')
+        self.assertEqual(len(_events), 1)
+
+    def test_log_dir_race(self):
+        _path = '{}/logs/events.log'.format(self.dir)
+        _orig_exists = os.path.exists
+
+        def _exists(path):  # Dir is created by another process first
+            if path == os.path.dirname(_path):
+                return False
+            return _orig_exists(path)
+
+        os.mkdir(os.path.dirname(_path))
+        os.path.exists = _exists
+        try:
+            _log = fbx_exporter_v008._ExportEventLog(path=_path)
+        finally:
+            os.path.exists = _orig_exists
+        _log.emit('start', 'cam')
+        self.assertEqual(len(list(fbx_exporter_v008.iter_events(_path))), 1)
+
+    def test_group_throughput(self):
+        _events = []
+        fbx_exporter_v008.add_event_callback(_events.append)
+        _cmds = _Cmds(about=lambda **kwargs: True,
+                      file=lambda **kwargs: '/shots/shot010.ma')
+        _orig_cmds = fbx_exporter_v008.cmds
+        fbx_exporter_v008.cmds = _cmds
+        _orig_estimate = fbx_exporter_v008._estimate_exports
+        fbx_exporter_v008._estimate_exports = lambda exportables, **kwargs: [
+            {'keys': 100} for _ in exportables]
+        try:
+            fbx_exporter_v008._export_fbxs(
+                [_FakeCam('cam1', ['cam1']), _FakeCam('cam2', ['cam2'])],
+                dir_=self.dir, range_=(1, 10), timings=None, events=None)
+        finally:
+            fbx_exporter_v008.cmds = _orig_cmds
+            fbx_exporter_v008._estimate_exports = _orig_estimate
+
+        # Check bake is reported once for the group
+        _bakes = [_event for _event in _events
+                  if _event.get('stage') == 'bake']
+        self.assertEqual(len(_bakes), 1)
+        self.assertEqual(_bakes[0]['exportables'], ['cam1', 'cam2'])
+
+        # Check finish metrics are per exportable
+        _writes = dict([(_event['exportable'], _event) for _event in _events
+                        if _event.get('stage') == 'write'])
+        _finishes = [_event for _event in _events
+                     if _event['event'] == 'finish']
+        self.assertEqual(len(_finishes), 2)
+        for _finish in _finishes:
+            self.assertEqual(_finish['est_keys'], 100)
+            self.assertNotIn('keys', _finish)
+            self.assertEqual(
+                _finish['secs'],
+                max(_writes[_finish['exportable']]['secs'], 0.001))
+            self.assertEqual(_finish['bytes'], len(_finish['exportable']))
+
+    def test_rotate(self):
+        _path = '{}/events.log'.format(self.dir)
+        _log = fbx_exporter_v008._ExportEventLog(
+            path=_path, max_bytes=100, backups=2)
+        for _idx in range(10):
+            _log.emit('start', 'cam{:d}'.format(_idx))
+        self.assertEqual(
+            sorted(os.listdir(self.dir)),
+            ['events.log', 'events.log.1', 'events.log.2'])
+        _events = list(fbx_exporter_v008.iter_events(_path))
+        self.assertEqual(_events[-1]['exportable'], 'cam9')
+
+
+class TestExportGroup(unittest.TestCase):
+
+    def setUp(self):
+        self.cmds = _Cmds()
+        self._orig_cmds = fbx_exporter_v008.cmds
+        fbx_exporter_v008.cmds = self.cmds
+
+    def tearDown(self):
+        fbx_exporter_v008.cmds = self._orig_cmds
+
+    def test_single_bake(self):
+        _cam = _FakeCam('cam', ['cam'])
+        _rig = _FakeRig('rig', ['rig:ctl'])
+        _written = fbx_exporter_v008._export_group(
+            [(_cam, 'cam.fbx'), (_rig, 'rig.fbx')], range_=(1, 10),
+            roots=['root'])
+        self.assertEqual([_item[:2] for _item in _written],
+                         [(_cam, 'cam.fbx'), (_rig, 'rig.fbx')])
+
+        # Check all nodes are baked together in one pass
+        _bakes = [_call for _call in self.cmds.calls
+                  if _call[0] == 'bakeResults']
+        self.assertEqual(len(_bakes), 1)
+        self.assertEqual(_bakes[0][1][0], ['dup_cam', 'rig:root'])
+        self.assertTrue(_bakes[0][2]['simulation'])
+
+        # Check fbxs are written from baked nodes without rebaking
+        self.assertEqual(_cam.writes[0]['nodes'], ['dup_cam'])
+        self.assertEqual(_rig.writes[0]['nodes'], ['rig:root'])
+        for _exp in [_cam, _rig]:
+            self.assertFalse(_exp.writes[0]['bake_anim'])
+
+        # Check bake is undone and namespace restored
+        _names = [_call[0] for _call in self.cmds.calls]
+        self.assertIn('undo', _names)
+        self.assertEqual(
+            self.cmds.calls[-1],
+            ('namespace', (), {'setNamespace': ':'}))
+
+
+class TestShareSkeletons(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cmds = _Cmds(
+            about=lambda **kwargs: True,
+            file=lambda **kwargs: '/shots/shot010.ma')
+        self._orig_cmds = fbx_exporter_v008.cmds
+        fbx_exporter_v008.cmds = self.cmds
+
+    def tearDown(self):
+        fbx_exporter_v008.cmds = self._orig_cmds
+        shutil.rmtree(self.dir)
+
+    def _rig(self, name, source_file):
+        _rig = _FakeRig(name, [name+':root'])
+        _rig.source_file = source_file
+        return _rig
+
+    def test_share_skeletons(self):
+        _rig_a1 = self._rig('hero1', '/assets/a/hero.ma')
+        _rig_a2 = self._rig('hero2', '/assets/a/hero.ma')
+        _rig_b = self._rig('hero3', '/assets/b/hero.ma')
+        _cam = _FakeCam('cam', ['cam'])
+        fbx_exporter_v008._export_fbxs(
+            [_rig_a1, _rig_a2, _rig_b, _cam], dir_=self.dir,
+            range_=(1, 10), share_skeletons=True, timings=None,
+            events=None)
+
+        # Check one skeleton per source file, kept apart by path hash
+        _sk_a = 'SK_hero_{}.fbx'.format(
+            hashlib.md5(b'/assets/a/hero.ma').hexdigest()[:8])
+        _sk_b = 'SK_hero_{}.fbx'.format(
+            hashlib.md5(b'/assets/b/hero.ma').hexdigest()[:8])
+        self.assertNotEqual(_sk_a, _sk_b)
+        self.assertEqual(
+            [os.path.basename(_write['fbx']) for _write in _rig_a1.writes
+             if _write.get('skeleton_only')], [_sk_a])
+        self.assertFalse([_write for _write in _rig_a2.writes
+                          if _write.get('skeleton_only')])
+
+        # Check animation only is just applied to rigs
+        for _rig in [_rig_a1, _rig_a2, _rig_b]:
+            self.assertTrue(_rig.writes[-1]['animation_only'])
+        self.assertFalse(_cam.writes[-1]['animation_only'])
+
+        # Check manifest
+        with open('{}/A_shot010_skeletons.json'.format(self.dir)) as _file:
+            _manifest = json.load(_file)
+        self.assertEqual(_manifest, {
+            'A_shot010_hero1.fbx': {
+                'skeleton': _sk_a, 'source': '/assets/a/hero.ma'},
+            'A_shot010_hero2.fbx': {
+                'skeleton': _sk_a, 'source': '/assets/a/hero.ma'},
+            'A_shot010_hero3.fbx': {
+                'skeleton': _sk_b, 'source': '/assets/b/hero.ma'}})
+
+    def test_undo_state_restored(self):
+        def _undo(*args, **kwargs):
+            raise RuntimeError('undo failed')
+
+        self.cmds.funcs['undo'] = _undo
+        self.cmds.funcs['undoInfo'] = lambda **kwargs: (
+            False if kwargs.get('query') else None)
+        _rig = self._rig('hero1', '/assets/a/hero.ma')
+        with self.assertRaises(RuntimeError):
+            _rig.export_skeleton_fbx(
+                fbx='{}/SK_hero.fbx'.format(self.dir), range_=(1, 10))
+        self.assertEqual(
+            [_call[2] for _call in self.cmds.calls
+             if _call[0] == 'undoInfo'][-1], {'state': False})
+
+
+class TestBakeWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.cmds = _Cmds(
+            ls=self._ls,
+            listAttr=lambda node, **kwargs: ['rotateX', 'visibility'],
+            listConnections=lambda node, **kwargs: [
+                node+'.rotateX', 'anim.output'])
+        self._orig_cmds = fbx_exporter_v008.cmds
+        fbx_exporter_v008.cmds = self.cmds
+
+    def tearDown(self):
+        fbx_exporter_v008.cmds = self._orig_cmds
+
+    def _ls(self, nodes, **kwargs):
+        if not kwargs.get('dag'):
+            return list(nodes)
+        _dag_nodes = []
+        for _node in nodes:
+            _path = '|{}:grp|{}'.format(_node.split(':')[0], _node)
+            _dag_nodes += [_path, '{}|{}:jnt'.format(
+                _path, _node.split(':')[0])]
+        return _dag_nodes
+
+    def test_rig_channel_keys(self):
+        _plugs = fbx_exporter_v008._find_bake_channels(
+            [], rigs=[('hero1', ['hero1:root']), ('hero2', ['hero2:root'])])
+        self.assertEqual(_plugs, {
+            '0/rig/|grp|root/rotateX': '|hero1:grp|hero1:root.rotateX',
+            '0/rig/|grp|root|jnt/rotateX':
+                '|hero1:grp|hero1:root|hero1:jnt.rotateX',
+            '1/rig/|grp|root/rotateX': '|hero2:grp|hero2:root.rotateX',
+            '1/rig/|grp|root|jnt/rotateX':
+                '|hero2:grp|hero2:root|hero2:jnt.rotateX'})
+
+    def test_rigs_baked_in_workers(self):
+        _jobs = []
+        _applied = []
+
+        def _bake_in_workers(cams, range_, workers, rigs=()):
+            _jobs.append(rigs)
+            return [
+                {'range': _range, 'channels': dict([
+                    (_key, [0.0]*(_range[1]-_range[0]+1))
+                    for _key in fbx_exporter_v008._find_bake_channels(
+                        cams, rigs=rigs)])}
+                for _range in fbx_exporter_v008._split_range(
+                    range_, workers)]
+
+        _orig_funcs = (fbx_exporter_v008._bake_in_workers,
+                       fbx_exporter_v008._apply_bake)
+        fbx_exporter_v008._bake_in_workers = _bake_in_workers
+        fbx_exporter_v008._apply_bake = (
+            lambda channels, plugs, start: _applied.append(channels))
+        try:
+            _rig = _FakeRig('hero1', ['hero1:root'])
+            _rig.namespace = 'hero1'
+            fbx_exporter_v008._export_group(
+                [(_rig, 'rig.fbx')], range_=(1, 10), roots=['root'],
+                workers=3)
+        finally:
+            (fbx_exporter_v008._bake_in_workers,
+             fbx_exporter_v008._apply_bake) = _orig_funcs
+
+        self.assertEqual(_jobs, [[('hero1', ['hero1:root'])]])
+        self.assertNotIn('bakeResults',
+                         [_call[0] for _call in self.cmds.calls])
+        self.assertEqual(sorted(_applied[0]), [
+            '0/rig/|grp|root/rotateX', '0/rig/|grp|root|jnt/rotateX'])
+        self.assertEqual(len(_applied[0]['0/rig/|grp|root/rotateX']), 10)
+
+
+class TestFitTimings(unittest.TestCase):
+
+    def test_fit(self):
+        self.assertIsNone(fbx_exporter_v008._fit_timings([], 'secs'))
+        self.assertEqual(fbx_exporter_v008._fit_timings(
+            [{'keys': 100, 'secs': 2.0}, {'keys': 300, 'secs': 4.0}],
+            'secs'), (1.0, 0.01))
+        self.assertEqual(fbx_exporter_v008._fit_timings(
+            [{'keys': 100, 'secs': 2.0}], 'secs'), (0.0, 0.02))
+
+    def test_fit_no_keys(self):
+        self.assertEqual(fbx_exporter_v008._fit_timings(
+            [{'keys': 0, 'secs': 1.0}, {'keys': 0, 'secs': 3.0}], 'secs'),
+            (2.0, 0.0))
+
+
+class TestTimings(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = '{}/timings/timings.json'.format(self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        _records = [{'keys': _idx, 'secs': 1.0, 'bytes': 10}
+                    for _idx in range(3)]
+        fbx_exporter_v008._write_timings(_records, self.path)
+        self.assertEqual(
+            fbx_exporter_v008._read_timings(self.path), _records)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)),
+                         ['timings.json'])
+
+    def test_truncated(self):
+        os.mkdir(os.path.dirname(self.path))
+        with open(self.path, 'w') as _file:
+            _file.write('[{"keys": 1, "se')
+        self.assertEqual(fbx_exporter_v008._read_timings(self.path), [])
+
+    def test_write_error(self):
+        with open(os.path.dirname(self.path), 'w') as _file:
+            _file.write('not a dir')
+        fbx_exporter_v008._write_timings([{'keys': 1}], self.path)
+        self.assertEqual(os.listdir(self.dir), ['timings'])
+
+
+class TestPackager(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, filename, data):
+        _path = '{}/{}'.format(self.dir, filename)
+        with open(_path, 'wb') as _file:
+            _file.write(data)
+        return _path
+
+    def test_hash_ignores_timestamps(self):
+        _fbx_a = self._write('a.fbx', _build_fbx([
+            (b'FBXHeaderExtension', b'time 1'),
+            (b'FileId', b'id 1'),
+            (b'CreationTime', b'2020-01-01'),
+            (b'Objects', b'anim')], footer=b'footer 1'))
+        _fbx_b = self._write('b.fbx', _build_fbx([
+            (b'FBXHeaderExtension', b'time 2'),
+            (b'FileId', b'id 2'),
+            (b'CreationTime', b'2020-01-02'),
+            (b'Objects', b'anim')], footer=b'footer 2'))
+        _fbx_c = self._write('c.fbx', _build_fbx([
+            (b'FBXHeaderExtension', b'time 1'),
+            (b'Objects', b'new anim')]))
+        self.assertEqual(fbx_exporter_v008._hash_fbx(_fbx_a),
+                         fbx_exporter_v008._hash_fbx(_fbx_b))
+        self.assertNotEqual(fbx_exporter_v008._hash_fbx(_fbx_a),
+                            fbx_exporter_v008._hash_fbx(_fbx_c))
+
+    def test_unchanged_fbx_not_recompressed(self):
+        _archive = '{}/A_shot.zip'.format(self.dir)
+        _fbx = self._write('A_shot_cam.fbx', _build_fbx([
+            (b'CreationTime', b'2020-01-01'), (b'Objects', b'anim')]))
+        _packager = fbx_exporter_v008._FbxPackager(_archive)
+        _packager.submit(_fbx)
+        _packager.finish()
+        _gz = '{}/A_shot_cam.fbx.gz'.format(_packager.cache)
+        _mtime = int(os.path.getmtime(_gz)) - 100
+        os.utime(_gz, (_mtime, _mtime))
+
+        # Re-export with new timestamp
+        self._write('A_shot_cam.fbx', _build_fbx([
+            (b'CreationTime', b'2020-01-02'), (b'Objects', b'anim')]))
+        _packager = fbx_exporter_v008._FbxPackager(_archive)
+        _packager.submit(_fbx)
+        _packager.finish()
+        self.assertEqual(os.path.getmtime(_gz), _mtime)
+
+    def test_archive_only_contains_batch(self):
+        _archive = '{}/A_shot.zip'.format(self.dir)
+        _fbx_a = self._write('A_shot_a.fbx', b'a')
+        _fbx_b = self._write('A_shot_b.fbx', b'b')
+        _packager = fbx_exporter_v008._FbxPackager(_archive)
+        _packager.submit(_fbx_a)
+        _packager.submit(_fbx_b)
+        _packager.finish()
+        _packager = fbx_exporter_v008._FbxPackager(_archive)
+        _packager.submit(_fbx_b)
+        _packager.finish()
+        self.assertEqual(
+            sorted(zipfile.ZipFile(_archive).namelist()),
+            ['A_shot_b.fbx.gz', 'index.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
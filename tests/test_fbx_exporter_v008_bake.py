@@ -0,0 +1,119 @@
+"""Tests for fbx_exporter_v008_bake.
+
+These helpers have no maya dependency, so no stub modules are needed.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from fbx_exporter_v008_bake import (  # noqa: E402
+    _euler_filter, _merge_bake_segments, _split_range, _unwrap)
+
+
+def _rot_segment(range_, rots, idx=0):
+    """Build a bake segment with full rotate channels.
+
+    Args:
+        range_ (tuple): start/end frames
+        rots (tuple list): list of x/y/z rotations
+        idx (int): camera index
+
+    Returns:
+        (dict): segment data
+    """
+    _channels = {}
+    for _axis, _values in zip('XYZ', zip(*rots)):
+        _channels['{:d}/tfm/rotate{}'.format(idx, _axis)] = list(_values)
+    return {'range': range_, 'channels': _channels}
+
+
+class TestSplitRange(unittest.TestCase):
+
+    def test_split(self):
+        self.assertEqual(_split_range((1, 10), 3),
+                         [(1, 3), (4, 6), (7, 10)])
+        self.assertEqual(_split_range((1001.0, 1001.0), 4),
+                         [(1001, 1001)])
+        self.assertEqual(_split_range((1, 2), 5), [(1, 1), (2, 2)])
+
+    def test_continuous(self):
+        for _count in range(1, 12):
+            _segments = _split_range((-3, 7), _count)
+            self.assertEqual(_segments[0][0], -3)
+            self.assertEqual(_segments[-1][1], 7)
+            for _prev, _next in zip(_segments, _segments[1:]):
+                self.assertEqual(_next[0], _prev[1]+1)
+
+
+class TestEulerFilter(unittest.TestCase):
+
+    def test_unwrap(self):
+        self.assertEqual(_unwrap(-178, 179), 182)
+        self.assertEqual(_unwrap(359, 0), -1)
+        self.assertEqual(_unwrap(10, 0), 10)
+
+    def test_gimbal_flip(self):
+        _rots = _euler_filter([(0, 80, 0), (0, 85, 0), (180, 95, 180)])
+        self.assertEqual(_rots, [(0, 80, 0), (0, 85, 0), (0, 85, 0)])
+
+
+class TestMergeBakeSegments(unittest.TestCase):
+
+    def test_boundaries(self):
+        _segments = [
+            {'range': (4, 5), 'channels': {'0/tfm/translateX': [4, 5]}},
+            {'range': (1, 3), 'channels': {'0/tfm/translateX': [1, 2, 3]}},
+            {'range': (6, 6), 'channels': {'0/tfm/translateX': [6]}}]
+        self.assertEqual(_merge_bake_segments(_segments),
+                         {'0/tfm/translateX': [1, 2, 3, 4, 5, 6]})
+
+    def test_wrap_across_seam(self):
+        _channels = _merge_bake_segments([
+            _rot_segment((1, 3), [(0, 170, 0), (0, 175, 0), (0, 179, 0)]),
+            _rot_segment((4, 5), [(0, -178, 0), (0, -174, 0)])])
+        self.assertEqual(_channels['0/tfm/rotateY'],
+                         [170, 175, 179, 182, 186])
+        self.assertEqual(_channels['0/tfm/rotateX'], [0]*5)
+
+    def test_partial_rotate_wrap(self):
+        _channels = _merge_bake_segments([
+            {'range': (1, 2), 'channels': {'0/shp/rotateZ': [350, 355]}},
+            {'range': (3, 4), 'channels': {'0/shp/rotateZ': [0, 5]}}])
+        self.assertEqual(_channels['0/shp/rotateZ'], [350, 355, 360, 365])
+
+    def test_flip_across_seam(self):
+        _channels = _merge_bake_segments([
+            _rot_segment((1, 2), [(0, 80, 0), (0, 85, 0)], idx=1),
+            _rot_segment((3, 3), [(180, 95, 180)], idx=1)])
+        self.assertEqual(
+            [_channels['1/tfm/rotate'+_axis] for _axis in 'XYZ'],
+            [[0, 0, 0], [80, 85, 85], [0, 0, 0]])
+
+    def test_gap_error(self):
+        with self.assertRaises(ValueError):
+            _merge_bake_segments([
+                {'range': (1, 2), 'channels': {'0/tfm/translateX': [1, 2]}},
+                {'range': (4, 5), 'channels': {'0/tfm/translateX': [4, 5]}}])
+
+    def test_channel_mismatch_error(self):
+        with self.assertRaises(ValueError):
+            _merge_bake_segments([
+                {'range': (1, 2), 'channels': {'a': [1, 2], 'b': [1, 2]}},
+                {'range': (3, 4), 'channels': {'a': [3, 4]}}])
+        with self.assertRaises(ValueError):
+            _merge_bake_segments([
+                {'range': (1, 2), 'channels': {'a': [1, 2]}},
+                {'range': (3, 4), 'channels': {'a': [3, 4], 'b': [3, 4]}}])
+
+    def test_value_count_error(self):
+        with self.assertRaises(ValueError):
+            _merge_bake_segments([
+                {'range': (1, 3), 'channels': {'0/tfm/translateX': [1, 2]}}])
+
+
+if __name__ == '__main__':
+    unittest.main()